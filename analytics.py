@@ -0,0 +1,296 @@
+"""
+Columnar analytics snapshots.
+
+``export_snapshot()`` scans the OLTP database once (a read replica, or a
+``backup_copy()`` of the SQLite file made in small steps so writers are not
+blocked) and writes each table as a compressed NumPy ``.npz`` file with one array per
+column.  Bookings are denormalized with the booking user's tourist profile so
+spend can be grouped by region, vacation type, etc. without a join.
+
+``Snapshot.query()`` answers group-by questions over those arrays with
+vectorized NumPy code only: group keys are dictionary-encoded with
+``np.unique``, aggregates use ``np.bincount`` and percentiles are read from a
+single ``np.lexsort`` of (group, value).  Analytics never open a database
+connection.  When bookings are sharded the export reads every shard and does
+the place/user join in Python.
+"""
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+from sqlalchemy import create_engine, text
+
+USER_COLUMNS = {
+    'id': 'int', 'gender': 'str', 'age': 'float', 'family': 'float', 'region': 'str',
+    'trips_per_year': 'float', 'avg_budget_per_year': 'float', 'favorite_destination': 'str',
+    'vacation_type': 'str', 'travel_interest': 'float', 'points': 'float', 'level': 'str',
+}
+
+BOOKING_COLUMNS = {
+    'id': 'int', 'user_id': 'int', 'place_id': 'int', 'guests': 'float', 'total_price': 'float',
+    'status': 'str', 'nights': 'float', 'place_category': 'str', 'place_region': 'str',
+    'user_region': 'str', 'user_vacation_type': 'str', 'user_age': 'float', 'user_gender': 'str',
+}
+
+SNAPSHOT_QUERIES = {
+    'users': f"SELECT {', '.join(USER_COLUMNS)} FROM users",
+    'bookings': """
+        SELECT b.id, b.user_id, b.place_id, b.guests, b.total_price, b.status,
+               julianday(b.end_date) - julianday(b.start_date) AS nights,
+               p.category AS place_category, p.region AS place_region,
+               u.region AS user_region, u.vacation_type AS user_vacation_type,
+               u.age AS user_age, u.gender AS user_gender
+        FROM bookings b
+        LEFT JOIN places p ON p.id = b.place_id
+        LEFT JOIN users u ON u.id = b.user_id
+    """,
+}
+
+SNAPSHOT_COLUMNS = {'users': USER_COLUMNS, 'bookings': BOOKING_COLUMNS}
+
+# Sharded bookings cannot be joined in SQL: raw rows per shard, joined in Python
+SHARD_BOOKINGS_QUERY = """
+    SELECT id, user_id, place_id, guests, total_price, status,
+           julianday(end_date) - julianday(start_date) AS nights
+    FROM bookings
+"""
+PLACE_LOOKUP_QUERY = "SELECT id, category, region FROM places"
+USER_LOOKUP_QUERY = "SELECT id, region, vacation_type, age, gender FROM users"
+
+# Stepped backups: pages per step and the pause that lets writers commit between steps
+BACKUP_STEP_PAGES = 256
+BACKUP_STEP_SLEEP = 0.005
+# A write by another connection restarts the copy; give up after this many
+BACKUP_MAX_RESTARTS = 20
+
+AGGREGATES = ('count', 'sum', 'avg', 'min', 'max', 'p25', 'p50', 'p75', 'p90', 'p95', 'p99')
+
+
+class AnalyticsError(ValueError):
+    """Yanlış analitika sorğusu"""
+
+
+def _to_column(values, kind):
+    if kind == 'str':
+        return np.array(['' if v is None else str(v) for v in values], dtype=str)
+    if kind == 'int':
+        return np.array([-1 if v is None else v for v in values], dtype=np.int64)
+    return np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+
+
+def _where_value(name, value, kind):
+    """Filtr dəyərini sütunun tipinə çevir (sətirlər kəsilmədən müqayisə olunur)"""
+    if kind == 'str':
+        return str(value)
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        raise AnalyticsError(f'Yanlış filtr dəyəri: {name}={value}') from None
+
+
+def _restart_limit(max_restarts):
+    """Backup progress callback: copy restarted too often by concurrent writes -> RuntimeError"""
+    state = {'restarts': 0, 'remaining': None}
+
+    def progress(status, remaining, total):
+        if state['remaining'] is not None and remaining >= state['remaining']:
+            state['restarts'] += 1
+            if state['restarts'] > max_restarts:
+                raise RuntimeError(f"Backup restarted {state['restarts']} times by concurrent writes")
+        state['remaining'] = remaining
+
+    return progress
+
+
+@contextmanager
+def backup_copy(engine, pages=BACKUP_STEP_PAGES, sleep=BACKUP_STEP_SLEEP, max_restarts=BACKUP_MAX_RESTARTS):
+    """SQLite bazasının müvəqqəti fayla surəti üçün engine (digər bazalar olduğu kimi)"""
+    if engine.dialect.name != 'sqlite':
+        yield engine
+        return
+
+    fd, path = tempfile.mkstemp(prefix='azerguest-export-', suffix='.db')
+    os.close(fd)
+    copy = None
+    try:
+        # The online backup API copies `pages` at a time and releases the read
+        # lock in between; the export queries then run on the copy
+        source = engine.raw_connection()
+        target = sqlite3.connect(path)
+        try:
+            source.driver_connection.backup(target, pages=pages, progress=_restart_limit(max_restarts), sleep=sleep)
+        finally:
+            target.close()
+            source.close()
+        copy = create_engine(f'sqlite:///{path}')
+        yield copy
+    finally:
+        if copy is not None:
+            copy.dispose()
+        os.remove(path)
+
+
+def _sharded_bookings(conn, shard_engines):
+    """Shard-lardakı rezervasiyaları məkan və istifadəçi məlumatı ilə birləşdir"""
+    places = {row[0]: row[1:] for row in conn.execute(text(PLACE_LOOKUP_QUERY))}
+    users = {row[0]: row[1:] for row in conn.execute(text(USER_LOOKUP_QUERY))}
+    missing_place, missing_user = (None,) * 2, (None,) * 4
+
+    rows = []
+    for shard_engine in shard_engines:
+        with shard_engine.connect() as shard_conn:
+            for row in shard_conn.execute(text(SHARD_BOOKINGS_QUERY)):
+                rows.append(tuple(row) + places.get(row[2], missing_place) + users.get(row[1], missing_user))
+    return rows
+
+
+def export_snapshot(engine, directory, shard_engines=()):
+    """Cədvəlləri sütunlu .npz fayllarına yaz (atomik əvəzləmə ilə)"""
+    os.makedirs(directory, exist_ok=True)
+    exported = {}
+
+    with engine.connect() as conn:
+        for table, sql in SNAPSHOT_QUERIES.items():
+            if table == 'bookings' and shard_engines:
+                rows = _sharded_bookings(conn, shard_engines)
+            else:
+                rows = conn.execute(text(sql)).all()
+            columns = SNAPSHOT_COLUMNS[table]
+            arrays = {
+                name: _to_column([row[i] for row in rows], kind)
+                for i, (name, kind) in enumerate(columns.items())
+            }
+            arrays['__exported_at__'] = np.array([time.time()])
+
+            path = os.path.join(directory, f'{table}.npz')
+            tmp_path = path + '.tmp.npz'
+            np.savez_compressed(tmp_path, **arrays)
+            os.replace(tmp_path, path)
+            exported[table] = len(rows)
+
+    return exported
+
+
+class Snapshot:
+    """Diskdəki snapshot-ları yükləyən və sorğulayan obyekt"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._tables = {}
+        self._lock = threading.Lock()
+
+    def table(self, name):
+        """Cədvəli yüklə; fayl dəyişibsə yenidən oxu"""
+        if name not in SNAPSHOT_COLUMNS:
+            raise AnalyticsError(f'Naməlum cədvəl: {name}')
+
+        path = os.path.join(self.directory, f'{name}.npz')
+        if not os.path.exists(path):
+            raise FileNotFoundError(f'Snapshot tapılmadı: {path}')
+
+        mtime = os.path.getmtime(path)
+        with self._lock:
+            cached = self._tables.get(name)
+            if cached is None or cached[0] != mtime:
+                with np.load(path) as data:
+                    columns = {key: data[key] for key in data.files}
+                self._tables[name] = cached = (mtime, columns)
+        return cached[1]
+
+    def query(self, table, group_by=(), metrics=('count',), where=None):
+        """Qruplaşdırma və aqreqatlar: metrics = ['count', 'count:col' (boş olmayan), 'avg:col', 'p90:col', ...]"""
+        columns = self.table(table)
+        kinds = SNAPSHOT_COLUMNS[table]
+        n = len(columns['id'])
+
+        mask = np.ones(n, dtype=bool)
+        for name, value in (where or {}).items():
+            if name not in kinds:
+                raise AnalyticsError(f'Naməlum sütun: {name}')
+            mask &= columns[name] == _where_value(name, value, kinds[name])
+
+        # Dictionary-encode every group column and combine the codes
+        keys, codes, sizes = [], [], []
+        for name in group_by:
+            if name not in kinds:
+                raise AnalyticsError(f'Naməlum sütun: {name}')
+            uniques, inverse = np.unique(columns[name][mask], return_inverse=True)
+            keys.append(uniques)
+            codes.append(inverse.ravel())
+            sizes.append(max(len(uniques), 1))
+
+        rows = int(mask.sum())
+        if codes:
+            combined = np.ravel_multi_index(codes, sizes) if rows else np.zeros(0, dtype=np.int64)
+            groups, group_ids = np.unique(combined, return_inverse=True)
+            group_ids = group_ids.ravel()
+        else:
+            groups, group_ids = np.zeros(1 if rows else 0, dtype=np.int64), np.zeros(rows, dtype=np.int64)
+        group_count = len(groups)
+
+        results = {'count': np.bincount(group_ids, minlength=group_count)}
+        for metric in metrics:
+            if metric == 'count':
+                continue
+            aggregate, _, column = metric.partition(':')
+            if aggregate not in AGGREGATES or kinds.get(column) not in ('float', 'int'):
+                raise AnalyticsError(f'Yanlış metrika: {metric}')
+            values = columns[column][mask].astype(np.float64)
+            results[metric] = _aggregate(aggregate, values, group_ids, group_count)
+
+        unravelled = np.unravel_index(groups, sizes) if codes else ()
+        output = []
+        for g in range(group_count):
+            item = {name: keys[i][unravelled[i][g]].item() for i, name in enumerate(group_by)}
+            for metric, values in results.items():
+                value = values[g]
+                if metric.partition(':')[0] == 'count':
+                    item[metric] = int(value)
+                else:
+                    item[metric] = None if np.isnan(value) else round(float(value), 3)
+            output.append(item)
+        return output
+
+    def exported_at(self):
+        return float(self.table('users')['__exported_at__'][0])
+
+
+def _aggregate(aggregate, values, group_ids, group_count):
+    """Qruplar üzrə vektorlaşdırılmış aqreqat (NaN dəyərlər nəzərə alınmır)"""
+    valid = ~np.isnan(values)
+    ids, values = group_ids[valid], values[valid]
+    counts = np.bincount(ids, minlength=group_count).astype(np.float64)
+
+    if aggregate == 'count':
+        return counts
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        if aggregate == 'sum':
+            return np.bincount(ids, weights=values, minlength=group_count)
+        if aggregate == 'avg':
+            return np.bincount(ids, weights=values, minlength=group_count) / counts
+
+    result = np.full(group_count, np.nan)
+    if aggregate in ('min', 'max'):
+        ufunc = np.minimum if aggregate == 'min' else np.maximum
+        result[:] = np.inf if aggregate == 'min' else -np.inf
+        ufunc.at(result, ids, values)
+        result[counts == 0] = np.nan
+        return result
+
+    # Percentile with linear interpolation inside each sorted group
+    q = int(aggregate[1:]) / 100
+    order = np.lexsort((values, ids))
+    sorted_values = values[order]
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1])).astype(np.int64)
+    present = counts > 0
+    position = starts[present] + q * (counts[present] - 1)
+    lower = np.floor(position).astype(np.int64)
+    upper = np.ceil(position).astype(np.int64)
+    fraction = position - lower
+    result[present] = sorted_values[lower] * (1 - fraction) + sorted_values[upper] * fraction
+    return result
@@ -1,18 +1,69 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for, session
+from flask import Flask, Response, render_template, request, jsonify, redirect, url_for, session
 from flask_sqlalchemy import SQLAlchemy
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
 import os
 import secrets
+import threading
+import time
+
+import geo
+from analytics import AnalyticsError, Snapshot, backup_copy, export_snapshot
+from batch import run_batch
+from db_routing import DatabaseRouter, RoutingSession, read_only
+from events import EventHub
+from facets import FacetIndex
+from jobs import JobQueue
+from pricing import PricingEngine
+from sharding import ShardRouter
+from write_queue import WriteQueue
 
 app = Flask(__name__)
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(BASE_DIR, 'azerguest.db')
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('AZERGUEST_DATABASE_URI', 'sqlite:///' + os.path.join(BASE_DIR, 'azerguest.db'))
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['SECRET_KEY'] = secrets.token_hex(32)
 app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(days=7)
 
-db = SQLAlchemy(app)
+# Read replicas, e.g. AZERGUEST_REPLICAS=sqlite:///replica1.db,sqlite:///replica2.db
+app.config['SQLALCHEMY_REPLICA_URIS'] = [uri for uri in os.environ.get('AZERGUEST_REPLICAS', '').split(',') if uri]
+
+# Upper limit of place x date combinations per /api/quotes call
+MAX_QUOTES = 10000
+
+db = SQLAlchemy(app, session_options={'class_': RoutingSession})
+db_router = DatabaseRouter(app, db)
+
+# Group commit for favorites, bookings and registrations
+app.config['WRITE_QUEUE_ENABLED'] = os.environ.get('AZERGUEST_WRITE_QUEUE', '1') == '1'
+app.config['WRITE_QUEUE_SYNCHRONOUS'] = os.environ.get('AZERGUEST_SYNCHRONOUS', 'FULL')
+write_queue = WriteQueue(app, db)
+
+# Background jobs; extra workers: flask --app app jobs worker
+app.config['JOBS_WORKER_THREADS'] = int(os.environ.get('AZERGUEST_JOB_THREADS', '1'))
+job_queue = JobQueue(app, db)
+
+# Columnar analytics snapshots, never read from the live database
+app.config['ANALYTICS_DIR'] = os.environ.get('AZERGUEST_ANALYTICS_DIR', os.path.join(BASE_DIR, 'analytics'))
+analytics_snapshot = Snapshot(app.config['ANALYTICS_DIR'])
+# Hourly snapshots do not need a fresh replica, only one that has been synced
+app.config['ANALYTICS_MAX_REPLICA_LAG'] = int(os.environ.get('AZERGUEST_ANALYTICS_MAX_LAG', 3600))
+
+# /api/batch: size cap and pool for concurrent read-only sub-requests
+app.config['BATCH_MAX_REQUESTS'] = 20
+batch_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='batch')
+
+# Live updates over Server-Sent Events (/api/events)
+event_hub = EventHub(app)
+
+# Bookings (by place_id) and favorites (by user_id) sharded over several databases,
+# e.g. AZERGUEST_SHARDS=sqlite:///shard0.db,sqlite:///shard1.db (empty = no sharding)
+app.config['SHARD_URIS'] = [uri for uri in os.environ.get('AZERGUEST_SHARDS', '').split(',') if uri]
+app.config['SHARD_REBALANCING'] = os.environ.get('AZERGUEST_SHARD_REBALANCING', '0') == '1'
+
+app.config['ADMIN_EMAILS'] = [email for email in os.environ.get('AZERGUEST_ADMIN_EMAILS', '').split(',') if email]
 
 
 # ========================================
@@ -83,6 +134,8 @@ class Place(db.Model):
     image = db.Column(db.String(255), nullable=True)
     description = db.Column(db.Text, nullable=True)
     features = db.Column(db.Text, nullable=True)
+    latitude = db.Column(db.Float, nullable=True)
+    longitude = db.Column(db.Float, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     def to_dict(self):
@@ -96,7 +149,9 @@ class Place(db.Model):
             'views': self.views,
             'image': self.image,
             'description': self.description,
-            'features': self.features
+            'features': self.features,
+            'latitude': self.latitude,
+            'longitude': self.longitude
         }
 
 
@@ -116,6 +171,19 @@ class Booking(db.Model):
     
     user = db.relationship('User', backref='bookings')
     place = db.relationship('Place', backref='bookings')
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'user_id': self.user_id,
+            'place_id': self.place_id,
+            'start_date': self.start_date.isoformat(),
+            'end_date': self.end_date.isoformat(),
+            'guests': self.guests,
+            'total_price': self.total_price,
+            'status': self.status,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
 
 
 class Review(db.Model):
@@ -146,6 +214,26 @@ class Favorite(db.Model):
     place = db.relationship('Place', backref='favorites')
 
 
+# Bitmap facet index over places, kept in sync with ORM commits
+place_facets = FacetIndex(Place)
+place_facets.watch(RoutingSession)
+
+# In-memory place indexes only see this process's ORM commits; every serving
+# process rebuilds its own copy on this interval to pick up other writers
+app.config['PLACE_INDEX_REFRESH_SECONDS'] = int(os.environ.get('AZERGUEST_INDEX_REFRESH', '600'))
+
+# Seasonal nightly rates used for quotes and bookings
+pricing_engine = PricingEngine(Place)
+pricing_engine.init_app(app)
+pricing_engine.watch(RoutingSession)
+
+# Shard router for bookings and favorites (a single 'primary' shard when not sharded)
+shard_router = ShardRouter(app, db, {
+    'bookings': (Booking, 'place_id'),
+    'favorites': (Favorite, 'user_id'),
+}, primary_queue=write_queue)
+
+
 # ========================================
 # HELPER FUNCTIONS
 # ========================================
@@ -164,6 +252,125 @@ def calculate_user_level(points):
         return 'Ulduz Səyyah'
 
 
+def run_write(job):
+    """Yazma işini group-commit növbəsi ilə icra et"""
+    result = write_queue.run(job)
+    db_router.note_write()
+    return result
+
+
+def run_shard_write(table, key, job):
+    """job(session) açarın shard-ında icra et"""
+    result = shard_router.run_write(shard_router.shard_for(table, key), job)
+    db_router.note_write()
+    return result
+
+
+def refresh_place_indexes():
+    """Bu prosesin facet indeksini və qiymətlərini yenidən qur"""
+    place_facets.rebuild(db.engine)
+    pricing_engine.rebuild(db.engine)
+
+
+_index_refresh_lock = threading.Lock()
+_index_refresh_thread = None
+
+
+@app.before_request
+def start_index_refresh():
+    """İlk sorğuda bu proses üçün indeks yeniləmə axınını başlat"""
+    global _index_refresh_thread
+    interval = app.config['PLACE_INDEX_REFRESH_SECONDS']
+    if _index_refresh_thread is not None or not interval:
+        return
+    with _index_refresh_lock:
+        if _index_refresh_thread is not None:
+            return
+        
+        # Started per serving process (after any fork), never in job workers
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    with app.app_context():
+                        refresh_place_indexes()
+                except Exception as e:
+                    print(f"Index refresh error: {str(e)}")
+        
+        _index_refresh_thread = threading.Thread(target=run, name='index-refresh', daemon=True)
+        _index_refresh_thread.start()
+
+
+def apply_place_filters(query, data):
+    """Kateqoriya, qiymət və reytinq filtrlərini tətbiq et"""
+    categories = data.get('categories', [])
+    if categories:
+        query = query.filter(Place.category.in_(categories))
+    
+    regions = data.get('regions', [])
+    if regions:
+        query = query.filter(Place.region.in_(regions))
+    
+    price_min = data.get('priceMin', 0)
+    price_max = data.get('priceMax', 1000)
+    query = query.filter(Place.price >= price_min, Place.price <= price_max)
+    
+    ratings = data.get('ratings', [])
+    if ratings:
+        min_rating = min(ratings)
+        query = query.filter(Place.rating >= min_rating)
+    
+    return query
+
+
+def is_admin():
+    """Cari istifadəçi admindirmi"""
+    if 'user_id' not in session:
+        return False
+    user = User.query.get(session['user_id'])
+    return user is not None and user.email in app.config['ADMIN_EMAILS']
+
+
+# ========================================
+# BACKGROUND JOBS
+# ========================================
+
+@job_queue.task()
+def update_user_level(user_id):
+    """İstifadəçi səviyyəsini xallarına görə yenilə"""
+    user = User.query.get(user_id)
+    if user:
+        user.level = calculate_user_level(user.points)
+        db.session.commit()
+
+
+@job_queue.periodic(24 * 3600)
+def rebuild_place_ratings():
+    """Məkan reytinqlərini rəylərin ortalamasından yenidən hesabla"""
+    average = db.select(db.func.round(db.func.avg(Review.rating), 1)) \
+        .where(Review.place_id == Place.id).scalar_subquery()
+    has_reviews = db.select(Review.id).where(Review.place_id == Place.id).exists()
+    db.session.execute(db.update(Place).where(has_reviews).values(rating=average))
+    db.session.commit()
+    
+    # A bulk UPDATE never reaches FacetIndex.watch(): refresh this process's index.
+    # Other serving processes pick it up on their next PLACE_INDEX_REFRESH_SECONDS tick.
+    if place_facets.loaded:
+        place_facets.rebuild(db.engine)
+
+
+@job_queue.periodic(3600)
+def export_analytics():
+    """Analitika üçün sütunlu snapshot ixrac et (replikadan və ya bazanın surətindən)"""
+    replica = db_router.pick_replica(max_lag=app.config['ANALYTICS_MAX_REPLICA_LAG'])
+    with ExitStack() as stack:
+        # Never scan the live primary or shards: export from a stepped backup copy instead
+        engine = replica.engine if replica else stack.enter_context(backup_copy(db.engine))
+        shard_engines = [stack.enter_context(backup_copy(shard_engine))
+                         for shard_engine in shard_router.engines()]
+        export_snapshot(engine, app.config['ANALYTICS_DIR'], shard_engines)
+
+
 # ========================================
 # AUTHENTICATION ROUTES
 # ========================================
@@ -181,14 +388,9 @@ def register():
                 if field not in data or not data[field]:
                     return jsonify({'success': False, 'message': f'{field} tələb olunur'}), 400
             
-            # Check if user exists
-            if User.query.filter_by(email=data['email']).first():
-                return jsonify({'success': False, 'message': 'Bu email artıq qeydiyyatdan keçib'}), 400
-            
-            # Create user
             hashed_password = generate_password_hash(data['password'], method='pbkdf2:sha256')
             
-            new_user = User(
+            user_fields = dict(
                 name=data['name'],
                 email=data['email'],
                 password=hashed_password,
@@ -206,17 +408,28 @@ def register():
                 level='Yeni Səyyah'
             )
             
-            db.session.add(new_user)
-            db.session.commit()
+            def create_user():
+                # Check if user exists
+                if User.query.filter_by(email=user_fields['email']).first():
+                    return None
+                
+                new_user = User(**user_fields)
+                db.session.add(new_user)
+                db.session.flush()
+                return new_user.to_dict()
+            
+            user_data = run_write(create_user)
+            if user_data is None:
+                return jsonify({'success': False, 'message': 'Bu email artıq qeydiyyatdan keçib'}), 400
             
             # Login user
-            session['user_id'] = new_user.id
+            session['user_id'] = user_data['id']
             session.permanent = True
             
             return jsonify({
                 'success': True,
                 'message': 'Qeydiyyat uğurlu oldu!',
-                'user': new_user.to_dict()
+                'user': user_data
             })
             
         except Exception as e:
@@ -287,6 +500,7 @@ def profile():
 # ========================================
 
 @app.route('/')
+@read_only
 def index():
     """Ana səhifə"""
     places = Place.query.order_by(Place.rating.desc()).limit(12).all()
@@ -303,6 +517,7 @@ def index():
 # ========================================
 
 @app.route('/api/places', methods=['GET'])
+@read_only
 def api_get_places():
     """Bütün məkanları gətir"""
     try:
@@ -313,25 +528,132 @@ def api_get_places():
 
 
 @app.route('/api/places/filter', methods=['POST'])
+@read_only
 def api_filter_places():
     """Məkanları filtr et"""
     try:
         data = request.get_json()
         
-        query = Place.query
+        ratings = [float(rating) for rating in data.get('ratings', [])]
+        price_min = float(data.get('priceMin', 0))
+        price_max = float(data.get('priceMax', 1000))
+        
+        # Optional paging; without 'limit' every match is returned
+        offset = int(data.get('offset', 0))
+        limit = int(data['limit']) if data.get('limit') is not None else None
+        if offset < 0 or (limit is not None and limit < 0):
+            return jsonify({'success': False, 'message': 'offset və limit mənfi ola bilməz'}), 400
+        
+        place_facets.ensure_loaded(db.engine)
+        place_ids, facet_counts = place_facets.search(
+            categories=data.get('categories', []),
+            regions=data.get('regions', []),
+            price_min=price_min,
+            price_max=price_max,
+            min_rating=min(ratings) if ratings else None
+        )
+        page_ids = place_ids[offset:offset + limit] if limit is not None else place_ids[offset:]
+        
+        places = {place.id: place for place in Place.query.filter(Place.id.in_(page_ids)).all()}
+        return jsonify({
+            'success': True,
+            'count': len(place_ids),
+            'places': [places[pid].to_dict() for pid in page_ids if pid in places],
+            'facets': facet_counts
+        })
+    except (TypeError, ValueError) as e:
+        return jsonify({'success': False, 'message': f'Yanlış sorğu: {str(e)}'}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+
+@app.route('/api/places/nearby', methods=['GET'])
+@read_only
+def api_nearby_places():
+    """Yaxınlıqdakı məkanlar"""
+    try:
+        lat = request.args.get('lat', type=float)
+        lon = request.args.get('lon', type=float)
+        if lat is None or lon is None:
+            return jsonify({'success': False, 'message': 'lat və lon tələb olunur'}), 400
+        if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+            return jsonify({'success': False, 'message': 'Koordinatlar yanlışdır'}), 400
+        
+        radius = min(max(request.args.get('radius', 50, type=float), 0), 20000)
+        limit = min(max(request.args.get('limit', 20, type=int), 1), 500)
+        
+        filters = {
+            'categories': request.args.getlist('categories'),
+            'priceMin': request.args.get('priceMin', 0, type=int),
+            'priceMax': request.args.get('priceMax', 1000, type=int),
+            'ratings': request.args.getlist('ratings', type=float)
+        }
+        
+        # Bounding-box pruning on the R-tree, then exact haversine distance.
+        # The radius grows until `limit` places are found: everything outside
+        # a step's circle is farther than all of that step's hits.
+        use_rtree = geo.has_rtree(db.engine)
+        for step_radius in geo.search_radii(radius):
+            box = geo.bounding_box(lat, lon, step_radius)
+            query = db.session.query(Place.id, Place.latitude, Place.longitude)
+            query = geo.within_box(query, Place, box, use_rtree)
+            rows = apply_place_filters(query, filters).all()
+            nearest = geo.nearest(rows, lat, lon, step_radius, limit)
+            if len(nearest) >= limit:
+                break
+        places = {place.id: place for place in Place.query.filter(Place.id.in_([pid for pid, _ in nearest])).all()}
+        
+        results = []
+        for place_id, distance in nearest:
+            item = places[place_id].to_dict()
+            item['distance_km'] = round(distance, 3)
+            results.append(item)
+        
+        return jsonify({
+            'success': True,
+            'count': len(results),
+            'places': results
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+
+@app.route('/api/places/<int:place_id>/view', methods=['POST'])
+def api_place_view(place_id):
+    """Məkanın baxış sayını artır"""
+    try:
+        def bump_views():
+            updated = Place.query.filter_by(id=place_id).update({Place.views: Place.views + 1})
+            if not updated:
+                return None
+            return db.session.query(Place.views).filter_by(id=place_id).scalar()
         
-        categories = data.get('categories', [])
-        if categories:
-            query = query.filter(Place.category.in_(categories))
+        # Not run_write: a page view should not pin the visitor to the primary
+        views = write_queue.run(bump_views)
+        if views is None:
+            return jsonify({'success': False, 'message': 'Məkan tapılmadı'}), 404
         
-        price_min = data.get('priceMin', 0)
-        price_max = data.get('priceMax', 1000)
-        query = query.filter(Place.price >= price_min, Place.price <= price_max)
+        event_hub.publish('places', 'views', {'place_id': place_id, 'views': views}, key=place_id)
         
-        ratings = data.get('ratings', [])
-        if ratings:
-            min_rating = min(ratings)
-            query = query.filter(Place.rating >= min_rating)
+        return jsonify({'success': True, 'views': views})
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+
+@app.route('/api/search', methods=['GET'])
+@read_only
+def api_search():
+    """Axtarış"""
+    try:
+        q_from = request.args.get('from')
+        q_to = request.args.get('to')
+        
+        query = Place.query
+        
+        if q_from:
+            query = query.filter(Place.region.ilike(f"%{q_from}%"))
+        if q_to:
+            query = query.filter(Place.region.ilike(f"%{q_to}%"))
         
         places = query.all()
         return jsonify({
@@ -344,13 +666,18 @@ def api_filter_places():
 
 
 @app.route('/api/favorites', methods=['GET'])
+@read_only
 def api_get_favorites():
     """Sevimli məkanları gətir"""
     if 'user_id' not in session:
         return jsonify({'success': False, 'message': 'Giriş tələb olunur'}), 401
     
     try:
-        favorites = Favorite.query.filter_by(user_id=session['user_id']).all()
+        user_id = session['user_id']
+        favorites = shard_router.query_keyed(
+            'favorites', user_id,
+            lambda shard_session: shard_session.query(Favorite).filter_by(user_id=user_id).all()
+        )
         place_ids = [fav.place_id for fav in favorites]
         places = Place.query.filter(Place.id.in_(place_ids)).all()
         
@@ -376,19 +703,53 @@ def api_add_favorite():
         if not place_id:
             return jsonify({'success': False, 'message': 'place_id tələb olunur'}), 400
         
-        existing = Favorite.query.filter_by(place_id=place_id, user_id=session['user_id']).first()
-        if existing:
-            return jsonify({'success': False, 'message': 'Artıq sevimlilərdə var'})
+        user_id = session['user_id']
         
-        favorite = Favorite(place_id=place_id, user_id=session['user_id'])
-        db.session.add(favorite)
+        def add_favorite(shard_session):
+            existing = shard_session.query(Favorite).filter_by(place_id=place_id, user_id=user_id).first()
+            if existing:
+                return False
+            
+            shard_session.add(Favorite(id=shard_router.new_id(), place_id=place_id, user_id=user_id))
+            return True
         
-        # Award points
-        user = User.query.get(session['user_id'])
-        user.points += 5
-        user.level = calculate_user_level(user.points)
+        def remove_favorite(shard_session):
+            shard_session.query(Favorite).filter_by(place_id=place_id, user_id=user_id).delete()
         
-        db.session.commit()
+        def award_points():
+            User.query.filter_by(id=user_id).update({User.points: User.points + 5})
+            # The level is recalculated in the background; queued in this same commit
+            job_queue.enqueue('update_user_level', {'user_id': user_id}, priority=10,
+                              dedup_key=f'user_level:{user_id}', conn=db.session.connection())
+        
+        # While rebalancing the favorite may still be on its previous shard
+        if any(shard.session.query(Favorite.id).filter_by(place_id=place_id, user_id=user_id).first()
+               for shard in shard_router.previous_shards('favorites', user_id)):
+            return jsonify({'success': False, 'message': 'Artıq sevimlilərdə var'})
+        
+        if not shard_router.enabled:
+            # Same database: the favorite and its points commit together
+            def add_and_award(shard_session):
+                added = add_favorite(shard_session)
+                if added:
+                    award_points()
+                return added
+            
+            added = run_shard_write('favorites', user_id, add_and_award)
+        else:
+            added = run_shard_write('favorites', user_id, add_favorite)
+            if added:
+                try:
+                    run_write(award_points)
+                except Exception:
+                    # Nothing was committed on the primary: undo the favorite so
+                    # that a retry adds it (and awards the points) again
+                    run_shard_write('favorites', user_id, remove_favorite)
+                    raise
+        
+        if not added:
+            return jsonify({'success': False, 'message': 'Artıq sevimlilərdə var'})
+        event_hub.publish(f'user:{user_id}', 'favorite', {'place_id': place_id, 'action': 'added'}, key=place_id)
         
         return jsonify({'success': True, 'message': 'Sevimli məkana əlavə edildi'})
     except Exception as e:
@@ -406,12 +767,24 @@ def api_remove_favorite():
         data = request.get_json()
         place_id = data.get('place_id')
         
-        favorite = Favorite.query.filter_by(place_id=place_id, user_id=session['user_id']).first()
-        if not favorite:
+        user_id = session['user_id']
+        
+        def remove_favorite(shard_session):
+            favorite = shard_session.query(Favorite).filter_by(place_id=place_id, user_id=user_id).first()
+            if not favorite:
+                return False
+            
+            shard_session.delete(favorite)
+            return True
+        
+        # While rebalancing it may (also) still be on its previous shard
+        removed = [shard_router.run_write(shard, remove_favorite)
+                   for shard in shard_router.shards_for('favorites', user_id)]
+        db_router.note_write()
+        if not any(removed):
             return jsonify({'success': False, 'message': 'Sevimlilərdə tapılmadı'})
         
-        db.session.delete(favorite)
-        db.session.commit()
+        event_hub.publish(f'user:{user_id}', 'favorite', {'place_id': place_id, 'action': 'removed'}, key=place_id)
         
         return jsonify({'success': True, 'message': 'Sevimlilərdən silindi'})
     except Exception as e:
@@ -419,7 +792,149 @@ def api_remove_favorite():
         return jsonify({'success': False, 'message': str(e)}), 500
 
 
+@app.route('/api/quotes', methods=['POST'])
+@read_only
+def api_quotes():
+    """Bir neçə məkan və tarix üçün qiymət təklifləri"""
+    try:
+        data = request.get_json()
+        
+        place_ids = [int(pid) for pid in data.get('place_ids', [])]
+        dates = data.get('dates', [])
+        guests = int(data.get('guests', 1))
+        
+        if not place_ids or not dates:
+            return jsonify({'success': False, 'message': 'place_ids və dates tələb olunur'}), 400
+        if len(place_ids) * len(dates) > MAX_QUOTES:
+            return jsonify({'success': False, 'message': f'Maksimum {MAX_QUOTES} qiymət hesablana bilər'}), 400
+        
+        ranges = [(datetime.strptime(d['start_date'], '%Y-%m-%d').date(),
+                   datetime.strptime(d['end_date'], '%Y-%m-%d').date()) for d in dates]
+        
+        # Every place is quoted for every date range
+        pricing_engine.ensure_loaded(db.engine)
+        totals = pricing_engine.quote_many(
+            [pid for pid in place_ids for _ in ranges],
+            [start for _ in place_ids for start, _ in ranges],
+            [end for _ in place_ids for _, end in ranges],
+            [guests] * (len(place_ids) * len(ranges))
+        )
+        
+        quotes = []
+        for i, (place_id, (start, end)) in enumerate((pid, r) for pid in place_ids for r in ranges):
+            total = totals[i]
+            quotes.append({
+                'place_id': place_id,
+                'start_date': start.isoformat(),
+                'end_date': end.isoformat(),
+                'guests': guests,
+                'nights': (end - start).days,
+                'total_price': None if total != total else float(total)
+            })
+        
+        return jsonify({
+            'success': True,
+            'count': len(quotes),
+            'quotes': quotes
+        })
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({'success': False, 'message': f'Yanlış sorğu: {str(e)}'}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+
+@app.route('/api/booking', methods=['POST'])
+def api_create_booking():
+    """Rezervasiya yarat"""
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'message': 'Giriş tələb olunur'}), 401
+    
+    try:
+        data = request.get_json()
+        
+        required_fields = ['place_id', 'start_date', 'end_date', 'guests']
+        for field in required_fields:
+            if field not in data:
+                return jsonify({'success': False, 'message': f'{field} tələb olunur'}), 400
+        
+        place = Place.query.get(data['place_id'])
+        if not place:
+            return jsonify({'success': False, 'message': 'Məkan tapılmadı'}), 404
+        
+        start = datetime.strptime(data['start_date'], '%Y-%m-%d').date()
+        end = datetime.strptime(data['end_date'], '%Y-%m-%d').date()
+        guests = int(data['guests'])
+        
+        # Priced from the row just loaded: the engine's cached prices may be
+        # older than a change made by another process
+        pricing_engine.ensure_loaded(db.engine)
+        total_price = pricing_engine.quote(place.id, start, end, guests, base_price=place.price or 0)
+        if total_price is None:
+            return jsonify({'success': False, 'message': 'Tarixlər və ya qonaq sayı yanlışdır'}), 400
+        
+        booking_fields = dict(
+            id=shard_router.new_id(),
+            user_id=session['user_id'],
+            place_id=place.id,
+            start_date=start,
+            end_date=end,
+            guests=guests,
+            total_price=total_price
+        )
+        
+        def create_booking(shard_session):
+            booking = Booking(**booking_fields)
+            shard_session.add(booking)
+            shard_session.flush()
+            return booking.id
+        
+        booking_id = run_shard_write('bookings', place.id, create_booking)
+        # Bookings do not block each other's dates, so this only reports that
+        # the dates were booked, not that the place is no longer available
+        event_hub.publish('places', 'booked', {
+            'place_id': place.id,
+            'start_date': start.isoformat(),
+            'end_date': end.isoformat()
+        })
+        
+        return jsonify({
+            'success': True,
+            'message': 'Rezervasiya yaradıldı',
+            'booking_id': booking_id,
+            'total_price': total_price
+        })
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+
+@app.route('/api/bookings', methods=['GET'])
+@read_only
+def api_get_bookings():
+    """Cari istifadəçinin rezervasiyaları (bütün shard-lardan)"""
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'message': 'Giriş tələb olunur'}), 401
+    
+    try:
+        user_id = session['user_id']
+        # Bookings are sharded by place, so a user's bookings live on every shard
+        bookings = shard_router.scatter(
+            lambda shard_session: [booking.to_dict() for booking in
+                                   shard_session.query(Booking).filter_by(user_id=user_id)]
+        )
+        bookings.sort(key=lambda booking: (booking['start_date'], booking['id']), reverse=True)
+        
+        return jsonify({
+            'success': True,
+            'count': len(bookings),
+            'bookings': bookings
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+
 @app.route('/api/user/current', methods=['GET'])
+@read_only
 def api_current_user():
     """Cari istifadəçi"""
     if 'user_id' not in session:
@@ -438,6 +953,91 @@ def api_current_user():
         return jsonify({'success': False, 'message': str(e)}), 500
 
 
+@app.route('/api/events', methods=['GET'])
+def api_events():
+    """Canlı yeniliklər (Server-Sent Events)"""
+    topics = {'places'}
+    if 'user_id' in session:
+        topics.add(f"user:{session['user_id']}")
+    
+    subscriber = event_hub.subscribe(topics)
+    if subscriber is None:
+        return jsonify({'success': False, 'message': 'Çox sayda bağlantı var'}), 503
+    
+    response = Response(event_hub.stream(subscriber), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+    # Also covers responses closed before the stream was ever iterated
+    response.call_on_close(lambda: event_hub.unsubscribe(subscriber))
+    return response
+
+
+@app.route('/api/batch', methods=['POST'])
+def api_batch():
+    """Bir neçə API sorğusunu bir cavabda icra et"""
+    try:
+        data = request.get_json()
+        items = data.get('requests') if isinstance(data, dict) else None
+        
+        if not isinstance(items, list) or not items:
+            return jsonify({'success': False, 'message': 'requests tələb olunur'}), 400
+        if len(items) > app.config['BATCH_MAX_REQUESTS']:
+            return jsonify({'success': False, 'message': f"Maksimum {app.config['BATCH_MAX_REQUESTS']} sorğu göndərilə bilər"}), 400
+        
+        responses = run_batch(app, items, batch_executor)
+        return jsonify({
+            'success': True,
+            'count': len(responses),
+            'responses': responses
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+
+@app.route('/api/admin/jobs', methods=['GET'])
+def api_admin_jobs():
+    """Fon iş növbəsinin statistikası"""
+    if not is_admin():
+        return jsonify({'success': False, 'message': 'İcazə yoxdur'}), 403
+    
+    try:
+        return jsonify({
+            'success': True,
+            'jobs': job_queue.stats()
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+
+@app.route('/api/admin/analytics', methods=['GET'])
+def api_admin_analytics():
+    """Snapshot üzərində qruplaşdırılmış analitika"""
+    if not is_admin():
+        return jsonify({'success': False, 'message': 'İcazə yoxdur'}), 403
+    
+    try:
+        table = request.args.get('table', 'users')
+        group_by = [name for name in request.args.get('group_by', '').split(',') if name]
+        metrics = [name for name in request.args.get('metrics', 'count').split(',') if name]
+        where = {key[len('where.'):]: value for key, value in request.args.items() if key.startswith('where.')}
+        
+        rows = analytics_snapshot.query(table, group_by=group_by, metrics=metrics, where=where)
+        return jsonify({
+            'success': True,
+            'snapshot_at': datetime.utcfromtimestamp(analytics_snapshot.exported_at()).isoformat(),
+            'count': len(rows),
+            'rows': rows
+        })
+    except FileNotFoundError:
+        job_queue.enqueue('export_analytics', priority=5, dedup_key='export_analytics')
+        return jsonify({'success': False, 'message': 'Snapshot hələ hazır deyil, ixrac planlaşdırıldı'}), 503
+    except AnalyticsError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+
 # ========================================
 # DATABASE INITIALIZATION
 # ========================================
@@ -447,6 +1047,10 @@ def init_db():
     with app.app_context():
         # Create tables
         db.create_all()
+        geo.ensure_place_index(db.engine)
+        job_queue.create_table()
+        job_queue.schedule_periodic()
+        shard_router.create_tables()
         
         print("✅ Database cədvəlləri yaradıldı!")
         
@@ -455,51 +1059,63 @@ def init_db():
             sample_places = [
                 Place(name='Göygöl', category='gol', region='Gəncə-Qazax', price=50, rating=4.8, views=2567, 
                       image='./assets/img/114f9a2ec33af4cc6204a9ec1ef7893a.jpg', 
-                      description='Gözəl təbiət və təmiz hava', features='WiFi, Restoran, Parking'),
+                      description='Gözəl təbiət və təmiz hava', features='WiFi, Restoran, Parking',
+                      latitude=40.4097, longitude=46.3236),
                       
                 Place(name='Böyük Qafqaz dağları', category='dag', region='Şimal', price=85, rating=4.9, views=1234,
                       image='./assets/img/b1ed4c30ca688758ad1df626823f3e9d.jpg',
-                      description='Dağ turizmi və hiking', features='Treking, Kamp, Bələdçi'),
+                      description='Dağ turizmi və hiking', features='Treking, Kamp, Bələdçi',
+                      latitude=41.2667, longitude=47.8667),
                       
                 Place(name='Şəki Xan sarayı', category='tarix', region='Şəki-Zaqatala', price=40, rating=4.7, views=856,
                       image='./assets/img/d80231b02fc0ee33596e4b3ad7093174.jpg',
-                      description='Tarixi abidə və memarlıq', features='Muzey, Ekskursiya, Foto'),
+                      description='Tarixi abidə və memarlıq', features='Muzey, Ekskursiya, Foto',
+                      latitude=41.2045, longitude=47.196),
                       
                 Place(name='Nohur gölü', category='gol', region='Qəbələ', price=110, rating=4.9, views=3421,
                       image='./assets/img/f407fe6a8ada9d1e8234c27432a0d291.jpg',
-                      description='Sakit göl və piknik', features='Qayıq, Balıq ovu, Piknik'),
+                      description='Sakit göl və piknik', features='Qayıq, Balıq ovu, Piknik',
+                      latitude=40.963, longitude=47.819),
                       
                 Place(name='Şahdağ', category='dag', region='Qusar', price=95, rating=4.8, views=2890,
                       image='./assets/img/44b52ba9e8ae6016db193e363f587dc1.jpg',
-                      description='Qış turizmi və xizək', features='Xizək, Teleferik, Otel'),
+                      description='Qış turizmi və xizək', features='Xizək, Teleferik, Otel',
+                      latitude=41.3089, longitude=48.025),
                       
                 Place(name='Lahıc', category='macera', region='İsmayıllı', price=85, rating=4.6, views=1567,
                       image='./assets/img/bd6b575e4a642c8623419a2e042634d1.jpg',
-                      description='Dağ kəndi və sənətkarlıq', features='Sənətkarlıq, Tarixi evlər'),
+                      description='Dağ kəndi və sənətkarlıq', features='Sənətkarlıq, Tarixi evlər',
+                      latitude=40.8467, longitude=48.3914),
                       
                 Place(name='İçərişəhər', category='tarix', region='Bakı', price=70, rating=4.9, views=4123,
                       image='./assets/img/d81dd0d67b5c1ddfbbb7518278daeaf3.jpg',
-                      description='Qədim şəhər və muzeylər', features='Muzeylər, Mağazalar, Restoranlar'),
+                      description='Qədim şəhər və muzeylər', features='Muzeylər, Mağazalar, Restoranlar',
+                      latitude=40.3662, longitude=49.8372),
                       
                 Place(name='Xəzər dənizi sahili', category='deniz', region='Abşeron', price=60, rating=4.5, views=3456,
                       image='./assets/img/114f9a2ec33af4cc6204a9ec1ef7893a.jpg',
-                      description='Çimərlik və su əyləncələri', features='Çimərlik, Su idmanı, Kafe'),
+                      description='Çimərlik və su əyləncələri', features='Çimərlik, Su idmanı, Kafe',
+                      latitude=40.47, longitude=50.15),
                       
                 Place(name='Quba dağları', category='dag', region='Quba', price=75, rating=4.7, views=2134,
                       image='./assets/img/b1ed4c30ca688758ad1df626823f3e9d.jpg',
-                      description='Təbiət və trekking', features='Kamp, Treking, Təbiət'),
+                      description='Təbiət və trekking', features='Kamp, Treking, Təbiət',
+                      latitude=41.248, longitude=48.406),
                       
                 Place(name='Lənkəran sahili', category='deniz', region='Lənkəran', price=45, rating=4.6, views=1890,
                       image='./assets/img/d80231b02fc0ee33596e4b3ad7093174.jpg',
-                      description='Subtropik iqlim və çay', features='Çimərlik, Çay bağları'),
+                      description='Subtropik iqlim və çay', features='Çimərlik, Çay bağları',
+                      latitude=38.7536, longitude=48.87),
                       
                 Place(name='Qobustan', category='tarix', region='Abşeron', price=55, rating=4.8, views=2678,
                       image='./assets/img/f407fe6a8ada9d1e8234c27432a0d291.jpg',
-                      description='Qədim qaya rəsmləri', features='Muzey, Palçıq vulkanı'),
+                      description='Qədim qaya rəsmləri', features='Muzey, Palçıq vulkanı',
+                      latitude=40.1114, longitude=49.375),
                       
                 Place(name='Tufandağ', category='macera', region='Qəbələ', price=120, rating=4.9, views=3890,
                       image='./assets/img/44b52ba9e8ae6016db193e363f587dc1.jpg',
-                      description='Dağ kurort və aktivlər', features='Xizək, Teleferik, Restoran')
+                      description='Dağ kurort və aktivlər', features='Xizək, Teleferik, Restoran',
+                      latitude=41.015, longitude=47.855)
             ]
             
             db.session.bulk_save_objects(sample_places)
@@ -528,6 +1144,7 @@ def internal_error(error):
 
 if __name__ == '__main__':
     init_db()
+    job_queue.start_workers()
     print("=" * 60)
     print("🚀 AzerGuest Server işə başladı!")
     print("📍 URL: http://localhost:5000")
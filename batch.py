@@ -0,0 +1,122 @@
+"""
+Batch/multiplex dispatch of ``/api/*`` sub-requests.
+
+All sub-requests reuse the already decoded session of the batch request, so
+identity is resolved once and any session change (login, read-your-writes
+marker) is saved with the batch response.  Items are processed in order:
+writes run one at a time inside the batch request's own app context (one
+Flask-SQLAlchemy session, so e.g. the current user is loaded once and then
+served from the identity map), and every run of consecutive read-only items
+(views marked ``@read_only``, e.g. ``POST /api/places/filter``) is executed
+concurrently on a thread pool, each thread with its own app context and DB
+session.
+"""
+from flask import request, session
+from flask.ctx import RequestContext
+from werkzeug.test import EnvironBuilder
+
+ALLOWED_METHODS = ('GET', 'POST', 'PUT', 'PATCH', 'DELETE')
+
+
+class BatchError(ValueError):
+    """Yanlış batch sorğusu"""
+
+
+def _environ(item):
+    method = str(item.get('method', 'GET')).upper()
+    path = item.get('path', '')
+
+    if method not in ALLOWED_METHODS:
+        raise BatchError(f'Yanlış metod: {method}')
+    if not isinstance(path, str) or not path.startswith('/api/'):
+        raise BatchError(f'Yanlış yol: {path}')
+
+    builder = EnvironBuilder(
+        path=path,
+        method=method,
+        json=item.get('body') if method != 'GET' else None,
+        base_url=request.host_url,
+        headers={'User-Agent': request.headers.get('User-Agent', '')},
+    )
+    try:
+        return builder.get_environ()
+    finally:
+        builder.close()
+
+
+def _endpoint(app, environ):
+    """Alt-sorğunun endpoint adı (uyğun route yoxdursa None)"""
+    adapter = app.url_map.bind_to_environ(environ)
+    try:
+        endpoint, _ = adapter.match()
+    except Exception:
+        return None
+    return endpoint
+
+
+def _dispatch(app, environ, shared_session):
+    """Bir alt-sorğunu icra et və (status, body) qaytar"""
+    # Reuse the decoded session instead of opening it from the cookie again
+    ctx = RequestContext(app, environ, session=shared_session)
+    try:
+        with ctx:
+            response = app.full_dispatch_request()
+    except Exception as e:
+        print(f"Batch item error: {str(e)}")
+        return 500, {'success': False, 'message': 'Server xətası'}
+
+    # Streams such as /api/events never end, they cannot be batched.  Werkzeug's
+    # own error pages (404, 405) are also wrapped iterators but they are finite.
+    if response.is_streamed and response.status_code < 400:
+        response.close()
+        return 400, {'success': False, 'message': 'Axın cavabları batch-də dəstəklənmir'}
+
+    body = response.get_json(silent=True)
+    if body is None:
+        body = response.get_data(as_text=True)
+    return response.status_code, body
+
+
+def run_batch(app, items, executor):
+    """Alt-sorğuları icra et; nəticələr sorğularla eyni sırada qaytarılır"""
+    shared_session = session._get_current_object()
+    results = [None] * len(items)
+    pending_reads = []
+
+    def flush_reads():
+        futures = [(index, executor.submit(_dispatch, app, environ, shared_session))
+                   for index, environ in pending_reads]
+        for index, future in futures:
+            results[index] = future.result()
+        pending_reads.clear()
+
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            results[index] = (400, {'success': False, 'message': 'Alt-sorğu obyekt olmalıdır'})
+            continue
+        try:
+            environ = _environ(item)
+        except BatchError as e:
+            results[index] = (400, {'success': False, 'message': str(e)})
+            continue
+
+        # Matched like the real dispatch would (e.g. /api/%62atch), not by path string
+        endpoint = _endpoint(app, environ)
+        if endpoint == request.endpoint:
+            results[index] = (400, {'success': False, 'message': 'Batch sorğuları iç-içə ola bilməz'})
+            continue
+
+        if getattr(app.view_functions.get(endpoint), 'read_only', False):
+            pending_reads.append((index, environ))
+            continue
+
+        # Writes are barriers: earlier reads finish first, later reads see the write
+        flush_reads()
+        results[index] = _dispatch(app, environ, shared_session)
+
+    flush_reads()
+
+    return [
+        {'id': item.get('id', index) if isinstance(item, dict) else index, 'status': status, 'body': body}
+        for index, (item, (status, body)) in enumerate(zip(items, results))
+    ]
@@ -0,0 +1,116 @@
+"""
+Benchmark: booking writes/sec with bookings sharded over 1, 2, 4... SQLite files.
+
+    python bench_sharding.py [--shards 1,2,4] [--threads 16] [--writes 100] [--write-queue]
+
+Each shard count runs in its own process against fresh temporary databases.
+Threads insert bookings for random places through ``shard_router.run_write``,
+i.e. the storage path of ``POST /api/booking`` without the HTTP layer, which
+would otherwise make the GIL the bottleneck instead of the database.  By
+default every write is its own transaction (one fsync each) so the single
+writer lock of each SQLite file is what is being measured.
+
+On fast local disks (or a single CPU) Python itself is the bottleneck and no
+storage layout scales; ``--fsync-ms`` emulates a slower commit (network disk,
+fsync-heavy storage) by sleeping while the SQLite write lock is held.
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import event
+
+
+def run_shards(threads, writes, fsync_ms):
+    """Bir shard sayı üçün benchmark (AZERGUEST_* mühit dəyişənləri ilə)"""
+    import app as azerguest
+
+    azerguest.init_db()
+    router = azerguest.shard_router
+    if fsync_ms:
+        for engine in router.engines():
+            # 'commit' fires before the DBAPI commit, i.e. with the write lock held
+            event.listen(engine, 'commit', lambda conn: time.sleep(fsync_ms / 1000))
+    start_date = date.today() + timedelta(days=1)
+    end_date = start_date + timedelta(days=2)
+    errors = []
+
+    def worker(user_id):
+        rng = random.Random(user_id)
+        with azerguest.app.app_context():
+            for _ in range(writes):
+                place_id = rng.randint(1, 10000)
+                fields = dict(id=router.new_id(), user_id=user_id, place_id=place_id,
+                              start_date=start_date, end_date=end_date, guests=2, total_price=100.0)
+                try:
+                    router.run_write(router.shard_for('bookings', place_id),
+                                     lambda shard_session: shard_session.add(azerguest.Booking(**fields)))
+                except Exception as e:
+                    errors.append(str(e))
+
+    workers = [threading.Thread(target=worker, args=(i + 1,)) for i in range(threads)]
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    total = threads * writes
+    print(json.dumps({
+        'writes': total,
+        'errors': len(errors),
+        'seconds': round(elapsed, 3),
+        'writes_per_sec': round((total - len(errors)) / elapsed, 1),
+        'rows': {name: counts['bookings'] for name, counts in router.counts().items()},
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--shards', default='1,2,4', help='comma-separated shard counts')
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--writes', type=int, default=100, help='writes per thread')
+    parser.add_argument('--synchronous', default='FULL')
+    parser.add_argument('--write-queue', action='store_true', help='group-commit writes per shard')
+    parser.add_argument('--fsync-ms', type=float, default=0, help='emulated commit latency')
+    parser.add_argument('--run', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        run_shards(args.threads, args.writes, args.fsync_ms)
+        return
+
+    baseline = None
+    for count in [int(n) for n in args.shards.split(',')]:
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(os.environ,
+                       AZERGUEST_DATABASE_URI='sqlite:///' + os.path.join(tmp, 'bench.db'),
+                       AZERGUEST_SHARDS=','.join(f'sqlite:///{os.path.join(tmp, f"shard{i}.db")}'
+                                                 for i in range(count)),
+                       AZERGUEST_WRITE_QUEUE='1' if args.write_queue else '0',
+                       AZERGUEST_SYNCHRONOUS=args.synchronous)
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--run',
+                 '--threads', str(args.threads), '--writes', str(args.writes),
+                 '--fsync-ms', str(args.fsync_ms)],
+                env=env, capture_output=True, text=True, check=True,
+                cwd=os.path.dirname(os.path.abspath(__file__))
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            baseline = baseline or result['writes_per_sec']
+            print(f"{count:>2} shard(s): {result['writes_per_sec']:>8} writes/sec  "
+                  f"x{result['writes_per_sec'] / baseline:.2f}  "
+                  f"({result['writes']} writes, {result['errors']} errors, {result['seconds']}s, "
+                  f"rows per shard {list(result['rows'].values())})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""
+Benchmark: booking writes/sec with and without the group-commit write queue.
+
+    python bench_write_queue.py [--threads 16] [--writes 100] [--synchronous FULL]
+
+Each mode runs in its own process against a fresh temporary database.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+
+def run_mode(threads, writes):
+    """Bir rejimdə benchmark (AZERGUEST_* mühit dəyişənləri ilə)"""
+    import app as azerguest
+
+    azerguest.init_db()
+    with azerguest.app.app_context():
+        users = [azerguest.User(name=f'bench{i}', email=f'bench{i}@example.com', password='x',
+                                gender='-', age=30, region='Bakı') for i in range(threads)]
+        azerguest.db.session.add_all(users)
+        azerguest.db.session.commit()
+        user_ids = [user.id for user in users]
+
+    start_date = (date.today() + timedelta(days=1)).isoformat()
+    end_date = (date.today() + timedelta(days=3)).isoformat()
+    errors = []
+
+    def worker(user_id):
+        client = azerguest.app.test_client()
+        with client.session_transaction() as sess:
+            sess['user_id'] = user_id
+        for i in range(writes):
+            response = client.post('/api/booking', json={
+                'place_id': i % 12 + 1, 'start_date': start_date, 'end_date': end_date, 'guests': 2
+            })
+            if response.status_code != 200:
+                errors.append(response.get_json())
+
+    workers = [threading.Thread(target=worker, args=(user_id,)) for user_id in user_ids]
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    total = threads * writes
+    print(json.dumps({
+        'writes': total,
+        'errors': len(errors),
+        'seconds': round(elapsed, 3),
+        'writes_per_sec': round((total - len(errors)) / elapsed, 1),
+        'batches': azerguest.write_queue.stats['batches'],
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--writes', type=int, default=100, help='writes per thread')
+    parser.add_argument('--synchronous', default='FULL')
+    parser.add_argument('--mode', choices=['queue', 'inline'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        run_mode(args.threads, args.writes)
+        return
+
+    for mode in ('inline', 'queue'):
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(os.environ,
+                       AZERGUEST_DATABASE_URI='sqlite:///' + os.path.join(tmp, 'bench.db'),
+                       AZERGUEST_WRITE_QUEUE='1' if mode == 'queue' else '0',
+                       AZERGUEST_SYNCHRONOUS=args.synchronous)
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--mode', mode,
+                 '--threads', str(args.threads), '--writes', str(args.writes)],
+                env=env, capture_output=True, text=True, check=True,
+                cwd=os.path.dirname(os.path.abspath(__file__))
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            print(f"{mode:>6}: {result['writes_per_sec']:>8} writes/sec  "
+                  f"({result['writes']} writes, {result['errors']} errors, "
+                  f"{result['batches']} batches, {result['seconds']}s)")
+
+
+if __name__ == '__main__':
+    main()
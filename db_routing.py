@@ -0,0 +1,259 @@
+"""
+Read/write routing for the data layer.
+
+Read-only endpoints are marked with ``@read_only`` and their queries go to one
+of the configured read replicas; everything else (and every flush) goes to the
+primary database.
+
+Config keys:
+    SQLALCHEMY_REPLICA_URIS      list of replica database URIs (empty = no routing)
+    REPLICA_STICKY_SECONDS       read-your-writes window after a user's write
+    REPLICA_MAX_LAG_SECONDS      replicas lagging more than this are skipped
+    REPLICA_LAG_CHECK_SECONDS    how often replica lag is re-measured
+    REPLICA_SYNC_INTERVAL        seconds between SQLite replica copies (0 = off)
+
+SQLite replicas are plain file copies refreshed with the sqlite3 backup API
+(``flask sync-replicas`` or the background sync thread).  Their lag is read
+from the files, so writes and syncs made by any process count: a copy's mtime
+is set to the time its backup started, and it is stale once the primary file
+(or its WAL) has been modified after that.  Postgres replicas report their own
+lag through ``pg_last_xact_replay_timestamp()``.
+"""
+import itertools
+import os
+import sqlite3
+import threading
+import time
+from functools import wraps
+
+from flask import current_app, g, has_request_context, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import make_url
+
+
+class Replica:
+    """Tek replika: engine və gecikmə məlumatı"""
+
+    def __init__(self, uri):
+        self.uri = uri
+        self.engine = create_engine(uri)
+        self.lag = 0.0
+        self.checked_at = 0.0
+
+    @property
+    def is_sqlite(self):
+        return self.engine.dialect.name == 'sqlite'
+
+    def measure_lag(self, primary_path):
+        """Replikanın primary-dən neçə saniyə geri qaldığını ölç"""
+        if self.is_sqlite:
+            # File replicas are stale only if the primary was written after the last copy
+            if not os.path.exists(self.engine.url.database):
+                return float('inf')  # not synced yet
+            synced_at = os.path.getmtime(self.engine.url.database)
+            if _modified_at(primary_path) <= synced_at:
+                return 0.0
+            return time.time() - synced_at
+
+        if self.engine.dialect.name == 'postgresql':
+            with self.engine.connect() as conn:
+                lag = conn.execute(text(
+                    'SELECT COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)'
+                )).scalar()
+            return float(lag or 0)
+
+        return 0.0
+
+
+def _modified_at(path):
+    """SQLite faylının son dəyişmə vaxtı (WAL rejimində commit-lər -wal faylına yazılır)"""
+    modified_at = os.path.getmtime(path)
+    if os.path.exists(path + '-wal'):
+        modified_at = max(modified_at, os.path.getmtime(path + '-wal'))
+    return modified_at
+
+
+class DatabaseRouter:
+    """Oxuma sorğularını replikalara, yazmaları primary-yə yönləndir"""
+
+    def __init__(self, app=None, db=None):
+        self.replicas = []
+        self.db = db
+        self._rr = itertools.count()
+        self._lock = threading.Lock()
+        self._sync_thread = None
+        if app is not None:
+            self.init_app(app, db)
+
+    def init_app(self, app, db=None):
+        if db is not None:
+            self.db = db
+
+        app.config.setdefault('SQLALCHEMY_REPLICA_URIS', [])
+        app.config.setdefault('REPLICA_STICKY_SECONDS', 5)
+        app.config.setdefault('REPLICA_MAX_LAG_SECONDS', 2)
+        app.config.setdefault('REPLICA_LAG_CHECK_SECONDS', 1)
+        app.config.setdefault('REPLICA_SYNC_INTERVAL', 0)
+
+        self.replicas = [Replica(uri) for uri in app.config['SQLALCHEMY_REPLICA_URIS']]
+        app.extensions['db_router'] = self
+
+        @app.cli.command('sync-replicas')
+        def sync_replicas_command():
+            """SQLite replikalarını primary-dən yenilə"""
+            count = self.sync_sqlite_replicas()
+            print(f"✅ {count} replika yeniləndi")
+
+        if app.config['REPLICA_SYNC_INTERVAL'] and any(r.is_sqlite for r in self.replicas):
+            self.start_sync_thread(app)
+
+    # ----------------------------------------
+    # Routing
+    # ----------------------------------------
+
+    def note_write(self):
+        """Primary-yə yazma baş verdi"""
+        if has_request_context():
+            session['_db_last_write'] = time.time()
+
+    def is_sticky(self):
+        """İstifadəçi bu yaxınlarda yazıbsa, oxumalar primary-dən getsin"""
+        if not has_request_context():
+            return False
+        last_write = session.get('_db_last_write')
+        if not last_write:
+            return False
+        return time.time() - last_write < current_app.config['REPLICA_STICKY_SECONDS']
+
+    def pick_replica(self, max_lag=None):
+        """Gecikməsi limitdən az olan növbəti replikanı seç (yoxdursa None)"""
+        if not self.replicas:
+            return None
+
+        if max_lag is None:
+            max_lag = current_app.config['REPLICA_MAX_LAG_SECONDS']
+        check_every = current_app.config['REPLICA_LAG_CHECK_SECONDS']
+        start = next(self._rr)
+
+        for i in range(len(self.replicas)):
+            replica = self.replicas[(start + i) % len(self.replicas)]
+            now = time.time()
+            if now - replica.checked_at >= check_every:
+                try:
+                    replica.lag = replica.measure_lag(self._primary_path())
+                except Exception as e:
+                    print(f"Replica lag check error ({replica.uri}): {str(e)}")
+                    replica.lag = float('inf')
+                replica.checked_at = now
+            if replica.lag <= max_lag:
+                return replica
+
+        return None
+
+    def _primary_path(self):
+        return make_url(current_app.config['SQLALCHEMY_DATABASE_URI']).database
+
+    def read_engine(self):
+        """Cari sorğu üçün oxuma engine-i (primary üçün None)"""
+        if not has_request_context() or not g.get('db_read_only'):
+            return None
+        if self.is_sticky():
+            return None
+        if 'db_replica' not in g:
+            replica = self.pick_replica()
+            g.db_replica = replica.engine if replica else None
+        return g.db_replica
+
+    # ----------------------------------------
+    # SQLite replica sync
+    # ----------------------------------------
+
+    def sync_sqlite_replicas(self):
+        """Primary faylını sqlite3 backup API ilə SQLite replikalarına köçür"""
+        primary_path = self._primary_path()
+        count = 0
+
+        with self._lock:
+            for replica in self.replicas:
+                if not replica.is_sqlite:
+                    continue
+                started = time.time()
+                replica_path = replica.engine.url.database
+                src = sqlite3.connect(primary_path)
+                dst = sqlite3.connect(replica_path)
+                try:
+                    src.backup(dst)
+                finally:
+                    dst.close()
+                    src.close()
+                # The copy holds what the primary had when the backup started
+                os.utime(replica_path, (started, started))
+                replica.checked_at = 0.0
+                count += 1
+
+        return count
+
+    def start_sync_thread(self, app):
+        """SQLite replikalarını fon axınında periodik yenilə"""
+        if self._sync_thread is not None:
+            return
+
+        interval = app.config['REPLICA_SYNC_INTERVAL']
+
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    with app.app_context():
+                        self.sync_sqlite_replicas()
+                except Exception as e:
+                    print(f"Replica sync error: {str(e)}")
+
+        self._sync_thread = threading.Thread(target=run, name='replica-sync', daemon=True)
+        self._sync_thread.start()
+
+
+class RoutingSession(Session):
+    """Flask-SQLAlchemy sessiyası: read-only sorğularda replika engine-i qaytarır"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing:
+            router = current_app.extensions.get('db_router')
+            engine = router.read_engine() if router else None
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _mark_session_written(db_session, flush_context):
+    db_session.info['db_wrote'] = True
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _note_commit(db_session):
+    if db_session.info.pop('db_wrote', False):
+        router = current_app.extensions.get('db_router')
+        if router:
+            router.note_write()
+
+
+@event.listens_for(RoutingSession, 'after_rollback')
+def _clear_session_written(db_session):
+    db_session.info.pop('db_wrote', None)
+
+
+def read_only(view):
+    """Route-u read-only kimi işarələ: sorğular replikaya gedə bilər"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        # Restore the previous flag so batched sub-requests sharing `g` don't leak it
+        previous = g.get('db_read_only', False)
+        g.db_read_only = True
+        try:
+            return view(*args, **kwargs)
+        finally:
+            g.db_read_only = previous
+    wrapper.read_only = True
+    return wrapper
@@ -0,0 +1,142 @@
+"""
+In-process pub/sub with Server-Sent Events streaming.
+
+Publishers call ``hub.publish(topic, event, data, key=...)``.  Every subscriber
+has a bounded buffer; events that share a coalescing ``key`` (e.g. the view
+count of one place) replace each other while they wait, so a slow client gets
+the latest value once instead of every intermediate one.  When a buffer
+overflows the oldest events are dropped and the client is sent a ``resync``
+event telling it to refetch.
+
+An idle subscriber is just a blocked ``Condition.wait()`` that wakes up for the
+heartbeat, so it costs no CPU between events; under gevent/eventlet workers
+these waits are greenlets, which keeps thousands of open streams cheap.
+Events are only delivered to subscribers of the same process.
+"""
+import itertools
+import json
+import threading
+from collections import OrderedDict
+
+
+class Subscriber:
+    """Bir SSE bağlantısı: mövzular və məhdud bufer"""
+
+    def __init__(self, topics, buffer_size):
+        self.topics = frozenset(topics)
+        self.buffer_size = buffer_size
+        self.pending = OrderedDict()
+        self.overflowed = False
+        self.closed = False
+        self._condition = threading.Condition()
+
+    def push(self, key, event):
+        with self._condition:
+            if key in self.pending:
+                # Coalesce: newest value wins, position moves to the end
+                del self.pending[key]
+            elif len(self.pending) >= self.buffer_size:
+                self.pending.popitem(last=False)
+                self.overflowed = True
+            self.pending[key] = event
+            self._condition.notify()
+
+    def wait(self, timeout):
+        """Hadisələri gözlə; timeout bitəndə boş siyahı qaytar"""
+        with self._condition:
+            if not self.pending and not self.overflowed and not self.closed:
+                self._condition.wait(timeout)
+            events = list(self.pending.values())
+            self.pending.clear()
+            overflowed, self.overflowed = self.overflowed, False
+        if overflowed:
+            events.insert(0, {'id': None, 'event': 'resync', 'data': {}})
+        return events
+
+    def close(self):
+        with self._condition:
+            self.closed = True
+            self._condition.notify()
+
+
+class EventHub:
+    """Mövzular üzrə hadisə paylayıcısı"""
+
+    def __init__(self, app=None):
+        self._topics = {}
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self.buffer_size = 100
+        self.heartbeat = 15
+        self.max_subscribers = 10000
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('EVENTS_BUFFER_SIZE', 100)
+        app.config.setdefault('EVENTS_HEARTBEAT', 15)
+        app.config.setdefault('EVENTS_MAX_SUBSCRIBERS', 10000)
+
+        self.buffer_size = app.config['EVENTS_BUFFER_SIZE']
+        self.heartbeat = app.config['EVENTS_HEARTBEAT']
+        self.max_subscribers = app.config['EVENTS_MAX_SUBSCRIBERS']
+        app.extensions['event_hub'] = self
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    def subscribe(self, topics):
+        """Yeni abunəçi; limit dolubsa None"""
+        subscriber = Subscriber(topics, self.buffer_size)
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                return None
+            self._subscribers.add(subscriber)
+            for topic in subscriber.topics:
+                self._topics.setdefault(topic, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        subscriber.close()
+        with self._lock:
+            self._subscribers.discard(subscriber)
+            for topic in subscriber.topics:
+                subs = self._topics.get(topic)
+                if subs is not None:
+                    subs.discard(subscriber)
+                    if not subs:
+                        del self._topics[topic]
+
+    def publish(self, topic, event, data, key=None):
+        """Hadisəni mövzunun abunəçilərinə göndər"""
+        with self._lock:
+            subscribers = list(self._topics.get(topic, ()))
+        if not subscribers:
+            return 0
+
+        message = {'id': next(self._ids), 'event': event, 'data': data}
+        coalesce_key = (event, key) if key is not None else ('id', message['id'])
+        for subscriber in subscribers:
+            subscriber.push(coalesce_key, message)
+        return len(subscribers)
+
+    def stream(self, subscriber):
+        """SSE formatında generator; bağlantı bağlananda abunəlik silinir"""
+        try:
+            yield 'retry: 3000\n\n'
+            while not subscriber.closed:
+                events = subscriber.wait(self.heartbeat)
+                if not events:
+                    yield ': keepalive\n\n'
+                    continue
+                chunks = []
+                for message in events:
+                    if message['id'] is not None:
+                        chunks.append(f"id: {message['id']}\n")
+                    chunks.append(f"event: {message['event']}\n")
+                    chunks.append(f"data: {json.dumps(message['data'], ensure_ascii=False)}\n\n")
+                yield ''.join(chunks)
+        finally:
+            self.unsubscribe(subscriber)
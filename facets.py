@@ -0,0 +1,259 @@
+"""
+In-memory facet engine for the place filter sidebar.
+
+Every place occupies a slot in a set of parallel NumPy arrays.  Categories,
+regions and rating buckets are kept as boolean bitmaps over the slots and the
+price column is kept together with a lazily re-sorted order for range lookups.
+One ``search()`` call returns the matching ids and the counts for every facet
+under the current selection (each facet is counted with its own constraint
+left out, so the sidebar shows what selecting another value would give).
+
+The index follows ORM commits through ``watch()``; bulk writes that bypass the
+ORM should be followed by ``rebuild()``.  Commits applied while a rebuild
+runs its SELECT are buffered and replayed on top of the new index.
+"""
+import threading
+
+import numpy as np
+from sqlalchemy import event, select
+
+RATING_BUCKETS = (3.0, 3.5, 4.0, 4.5)
+PRICE_BINS = 10
+
+
+class FacetIndex:
+    """Məkanlar üçün bitmap indeksi"""
+
+    def __init__(self, model, capacity=1024):
+        self.model = model
+        self.loaded = False
+        self._changed_during_rebuild = None
+        self._lock = threading.RLock()
+        self._rebuild_lock = threading.Lock()
+        self._reset(capacity)
+
+    def _reset(self, capacity):
+        self.capacity = capacity
+        self.size = 0
+        self.slots = {}
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.prices = np.zeros(capacity, dtype=np.float64)
+        self.ratings = np.zeros(capacity, dtype=np.float64)
+        self.categories = {}
+        self.regions = {}
+        self.rating_buckets = {t: np.zeros(capacity, dtype=bool) for t in RATING_BUCKETS}
+        self._price_order = None
+
+    # ----------------------------------------
+    # Maintenance
+    # ----------------------------------------
+
+    def _grow(self):
+        capacity = self.capacity * 2
+
+        def grow(array):
+            bigger = np.zeros(capacity, dtype=array.dtype)
+            bigger[:self.capacity] = array
+            return bigger
+
+        self.ids = grow(self.ids)
+        self.alive = grow(self.alive)
+        self.prices = grow(self.prices)
+        self.ratings = grow(self.ratings)
+        for bitmaps in (self.categories, self.regions, self.rating_buckets):
+            for key in bitmaps:
+                bitmaps[key] = grow(bitmaps[key])
+        self.capacity = capacity
+
+    def _bitmap(self, bitmaps, key):
+        if key not in bitmaps:
+            bitmaps[key] = np.zeros(self.capacity, dtype=bool)
+        return bitmaps[key]
+
+    def _clear_slot(self, slot):
+        for bitmaps in (self.categories, self.regions, self.rating_buckets):
+            for bitmap in bitmaps.values():
+                bitmap[slot] = False
+
+    def _upsert(self, place_id, category, region, price, rating):
+        slot = self.slots.get(place_id)
+        if slot is None:
+            if self.size == self.capacity:
+                self._grow()
+            slot = self.size
+            self.size += 1
+            self.slots[place_id] = slot
+            self.ids[slot] = place_id
+        else:
+            self._clear_slot(slot)
+
+        rating = rating or 0.0
+        self.alive[slot] = True
+        self.prices[slot] = price or 0
+        self.ratings[slot] = rating
+        self._bitmap(self.categories, category)[slot] = True
+        if region:
+            self._bitmap(self.regions, region)[slot] = True
+        for threshold, bitmap in self.rating_buckets.items():
+            bitmap[slot] = rating >= threshold
+        self._price_order = None
+
+    def _remove(self, place_id):
+        slot = self.slots.pop(place_id, None)
+        if slot is None:
+            return
+        self.alive[slot] = False
+        self._clear_slot(slot)
+        self._price_order = None
+
+    def upsert(self, place_id, category, region, price, rating):
+        """Məkanı əlavə et və ya yenilə"""
+        with self._lock:
+            if self._changed_during_rebuild is not None:
+                self._changed_during_rebuild[place_id] = (category, region, price, rating)
+            if self.loaded:
+                self._upsert(place_id, category, region, price, rating)
+
+    def remove(self, place_id):
+        """Məkanı indeksdən çıxar (slot boş qalır)"""
+        with self._lock:
+            if self._changed_during_rebuild is not None:
+                self._changed_during_rebuild[place_id] = None
+            if self.loaded:
+                self._remove(place_id)
+
+    def rebuild(self, engine):
+        """İndeksi primary bazadan yenidən qur"""
+        with self._rebuild_lock:
+            self._load(engine)
+
+    def ensure_loaded(self, engine):
+        if not self.loaded:
+            with self._rebuild_lock:
+                if not self.loaded:
+                    self._load(engine)
+
+    def _load(self, engine):
+        with self._lock:
+            # Changes committed while the SELECT runs are replayed after the swap
+            self._changed_during_rebuild = {}
+        try:
+            model = self.model
+            with engine.connect() as conn:
+                rows = conn.execute(select(model.id, model.category, model.region, model.price, model.rating)).all()
+
+            with self._lock:
+                self._reset(max(1024, 1 << max(len(rows) - 1, 0).bit_length()))
+                for row in rows:
+                    self._upsert(*row)
+                for place_id, values in self._changed_during_rebuild.items():
+                    if values is None:
+                        self._remove(place_id)
+                    else:
+                        self._upsert(place_id, *values)
+                self.loaded = True
+        finally:
+            with self._lock:
+                self._changed_during_rebuild = None
+
+    def watch(self, session_class):
+        """Commit olunan ORM dəyişikliklərini indeksə tətbiq et"""
+        model = self.model
+
+        @event.listens_for(session_class, 'after_flush')
+        def collect(db_session, flush_context):
+            pending = db_session.info.setdefault('facet_changes', {})
+            for obj in list(db_session.new) + list(db_session.dirty):
+                if isinstance(obj, model):
+                    pending[obj.id] = (obj.category, obj.region, obj.price, obj.rating)
+            for obj in db_session.deleted:
+                if isinstance(obj, model):
+                    pending[obj.id] = None
+
+        @event.listens_for(session_class, 'after_commit')
+        def apply(db_session):
+            for place_id, values in db_session.info.pop('facet_changes', {}).items():
+                if values is None:
+                    self.remove(place_id)
+                else:
+                    self.upsert(place_id, *values)
+
+        @event.listens_for(session_class, 'after_rollback')
+        def discard(db_session):
+            db_session.info.pop('facet_changes', None)
+
+    # ----------------------------------------
+    # Queries
+    # ----------------------------------------
+
+    def _price_range(self, price_min, price_max):
+        if self._price_order is None:
+            live = np.flatnonzero(self.alive[:self.size])
+            order = live[np.argsort(self.prices[live], kind='stable')]
+            self._price_order = (order, self.prices[order])
+        order, sorted_prices = self._price_order
+
+        lo = np.searchsorted(sorted_prices, price_min, side='left')
+        hi = np.searchsorted(sorted_prices, price_max, side='right')
+        mask = np.zeros(self.size, dtype=bool)
+        mask[order[lo:hi]] = True
+        return mask
+
+    def _any_of(self, bitmaps, keys):
+        mask = np.zeros(self.size, dtype=bool)
+        for key in keys:
+            if key in bitmaps:
+                mask |= bitmaps[key][:self.size]
+        return mask
+
+    def search(self, categories=(), regions=(), price_min=0, price_max=1000, min_rating=None,
+               price_bins=PRICE_BINS):
+        """Uyğun id-lər və hər facet üçün saylar"""
+        with self._lock:
+            n = self.size
+            alive = self.alive[:n]
+
+            masks = {
+                'categories': self._any_of(self.categories, categories) if categories else alive,
+                'regions': self._any_of(self.regions, regions) if regions else alive,
+                'price': self._price_range(price_min, price_max),
+                'rating': self.ratings[:n] >= min_rating if min_rating is not None else alive,
+            }
+
+            def excluding(name):
+                mask = alive.copy()
+                for key, other in masks.items():
+                    if key != name:
+                        mask &= other
+                return mask
+
+            base = excluding('categories')
+            category_counts = {key: int(np.count_nonzero(bitmap[:n] & base))
+                               for key, bitmap in self.categories.items()}
+
+            base = excluding('regions')
+            region_counts = {key: int(np.count_nonzero(bitmap[:n] & base))
+                             for key, bitmap in self.regions.items()}
+
+            base = excluding('rating')
+            rating_counts = {str(threshold): int(np.count_nonzero(bitmap[:n] & base))
+                             for threshold, bitmap in self.rating_buckets.items()}
+
+            base = excluding('price')
+            prices = self.prices[:n][base]
+            upper = max(float(self.prices[:n][alive].max()) if alive.any() else 0.0, 1.0)
+            counts, edges = np.histogram(prices, bins=price_bins, range=(0.0, upper))
+
+            matched = excluding(None)
+            ids = np.sort(self.ids[:n][matched])
+
+        return ids.tolist(), {
+            'categories': {key: count for key, count in category_counts.items() if count},
+            'regions': {key: count for key, count in region_counts.items() if count},
+            'ratings': rating_counts,
+            'price_histogram': [
+                {'min': float(edges[i]), 'max': float(edges[i + 1]), 'count': int(counts[i])}
+                for i in range(len(counts))
+            ],
+        }
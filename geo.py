@@ -0,0 +1,174 @@
+"""
+Geospatial helpers for "places near me".
+
+Place coordinates are indexed in an SQLite R-tree (``places_rtree``) that is
+kept in sync with the ``places`` table by triggers, so every write path
+(ORM, bulk saves, raw SQL) updates it.  Nearby queries prune candidates with a
+bounding box on the R-tree and then compute exact haversine distances with
+NumPy.  On databases without the R-tree module the bounding box is applied to
+the ``places.latitude``/``places.longitude`` columns instead.
+
+To find the nearest ``limit`` places the search radius grows in steps
+(``search_radii()``) until enough places are found, so a dense area only loads
+the few rows around the centre instead of every row within the full radius.
+"""
+import math
+
+import numpy as np
+from sqlalchemy import column, inspect, or_, select, table, text
+
+EARTH_RADIUS_KM = 6371.0088
+FIRST_SEARCH_RADIUS_KM = 1.0
+SEARCH_RADIUS_GROWTH = 4
+
+places_rtree = table(
+    'places_rtree',
+    column('id'), column('min_lat'), column('max_lat'), column('min_lon'), column('max_lon'),
+)
+
+# engine -> whether it has places_rtree, set by ensure_place_index()
+_has_rtree = {}
+
+_RTREE_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS places_rtree USING rtree(id, min_lat, max_lat, min_lon, max_lon)",
+    """CREATE TRIGGER IF NOT EXISTS places_rtree_ai AFTER INSERT ON places
+       WHEN new.latitude IS NOT NULL AND new.longitude IS NOT NULL
+       BEGIN
+           INSERT OR REPLACE INTO places_rtree VALUES (new.id, new.latitude, new.latitude, new.longitude, new.longitude);
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS places_rtree_au AFTER UPDATE OF id, latitude, longitude ON places
+       BEGIN
+           DELETE FROM places_rtree WHERE id = old.id;
+           INSERT INTO places_rtree
+           SELECT new.id, new.latitude, new.latitude, new.longitude, new.longitude
+           WHERE new.latitude IS NOT NULL AND new.longitude IS NOT NULL;
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS places_rtree_ad AFTER DELETE ON places
+       BEGIN
+           DELETE FROM places_rtree WHERE id = old.id;
+       END""",
+    """INSERT OR REPLACE INTO places_rtree
+       SELECT id, latitude, latitude, longitude, longitude FROM places
+       WHERE latitude IS NOT NULL AND longitude IS NOT NULL""",
+]
+
+
+def ensure_place_index(engine):
+    """Koordinat sütunlarını və R-tree indeksini yarat; R-tree varsa True qaytar"""
+    columns = {c['name'] for c in inspect(engine).get_columns('places')}
+
+    with engine.begin() as conn:
+        # db.create_all() does not add columns to an existing table
+        for name in ('latitude', 'longitude'):
+            if name not in columns:
+                conn.execute(text(f'ALTER TABLE places ADD COLUMN {name} FLOAT'))
+
+        if engine.dialect.name != 'sqlite':
+            _has_rtree[engine] = False
+            return False
+
+        try:
+            for statement in _RTREE_DDL:
+                conn.execute(text(statement))
+        except Exception as e:
+            print(f"R-tree index unavailable: {str(e)}")
+            _has_rtree[engine] = False
+            return False
+
+    _has_rtree[engine] = True
+    return True
+
+
+def has_rtree(engine):
+    """Bazada places_rtree cədvəli varmı (engine başına bir dəfə yoxlanılır)"""
+    if engine not in _has_rtree:
+        _has_rtree[engine] = engine.dialect.name == 'sqlite' and inspect(engine).has_table('places_rtree')
+    return _has_rtree[engine]
+
+
+def bounding_box(lat, lon, radius_km):
+    """Mərkəz və radius üçün (south, north, west, east) qutusu; west > east antimeridianı keçir"""
+    dlat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    south = max(lat - dlat, -90.0)
+    north = min(lat + dlat, 90.0)
+
+    # Near the poles the box covers every longitude
+    if north >= 90.0 or south <= -90.0:
+        return south, north, -180.0, 180.0
+
+    # Widest longitude offset of the circle (at the tangent points, not at `lat`)
+    ratio = math.sin(radius_km / EARTH_RADIUS_KM) / math.cos(math.radians(lat))
+    if ratio >= 1.0:
+        return south, north, -180.0, 180.0
+    dlon = math.degrees(math.asin(ratio))
+
+    # Wrap instead of clamping: a box over the antimeridian ends up with west > east
+    west, east = lon - dlon, lon + dlon
+    if west < -180.0:
+        west += 360.0
+    if east > 180.0:
+        east -= 360.0
+    return south, north, west, east
+
+
+def search_radii(radius_km, first_km=FIRST_SEARCH_RADIUS_KM, growth=SEARCH_RADIUS_GROWTH):
+    """Artan axtarış radiusları: first_km, first_km*growth, ..., radius_km"""
+    step = min(first_km, radius_km)
+    while step < radius_km:
+        yield step
+        step *= growth
+    yield radius_km
+
+
+def haversine_km(lat, lon, lats, lons):
+    """Bir nöqtədən nöqtələr massivinə qədər məsafə (km), vektorlaşdırılmış"""
+    lat1 = math.radians(lat)
+    lat2 = np.radians(lats)
+    dlat = lat2 - lat1
+    dlon = np.radians(lons) - math.radians(lon)
+
+    a = np.sin(dlat / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def within_box(query, model, box, use_rtree):
+    """Sorğunu bounding box ilə məhdudlaşdır"""
+    south, north, west, east = box
+
+    if use_rtree:
+        def rtree_box(west, east):
+            return select(places_rtree.c.id).where(
+                places_rtree.c.max_lat >= south, places_rtree.c.min_lat <= north,
+                places_rtree.c.max_lon >= west, places_rtree.c.min_lon <= east,
+            )
+
+        # Across the antimeridian the box is two R-tree ranges: [west, 180] and [-180, east]
+        if west <= east:
+            candidates = rtree_box(west, east)
+        else:
+            candidates = rtree_box(west, 180.0).union_all(rtree_box(-180.0, east))
+        return query.filter(model.id.in_(candidates))
+
+    if west <= east:
+        longitude = model.longitude.between(west, east)
+    else:
+        longitude = or_(model.longitude >= west, model.longitude <= east)
+    return query.filter(model.latitude.between(south, north), longitude)
+
+
+def nearest(rows, lat, lon, radius_km, limit):
+    """(id, lat, lon) sətirlərindən radius daxilində ən yaxın `limit` id və məsafə"""
+    if not rows:
+        return []
+
+    ids = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+    lats = np.fromiter((r[1] for r in rows), dtype=np.float64, count=len(rows))
+    lons = np.fromiter((r[2] for r in rows), dtype=np.float64, count=len(rows))
+
+    distances = haversine_km(lat, lon, lats, lons)
+    inside = np.flatnonzero(distances <= radius_km)
+    if len(inside) > limit:
+        inside = inside[np.argpartition(distances[inside], limit - 1)[:limit]]
+    order = inside[np.argsort(distances[inside], kind='stable')]
+
+    return [(int(ids[i]), float(distances[i])) for i in order]
@@ -0,0 +1,384 @@
+"""
+Durable background job queue backed by a SQLite table.
+
+Request handlers call ``job_queue.enqueue('task_name', payload)`` and return
+immediately; workers (threads inside the web process and/or separate
+``flask jobs worker`` processes) claim jobs from the ``jobs`` table and run the
+registered task functions inside an app context.
+
+Features:
+    priorities          higher ``priority`` runs first
+    retries             failed jobs are retried with exponential backoff up to ``max_attempts``
+    deduplication       at most one queued and one running job per ``dedup_key``: enqueueing
+                        while the key's job runs queues one follow-up run, which
+                        is only claimed once the running job has finished
+    scheduled jobs      ``delay`` / ``run_at`` postpone a job
+    periodic jobs       ``@job_queue.periodic(seconds)`` re-enqueues a task on a fixed interval
+    monitoring          ``stats()`` reports queue depth and job latency
+
+Config keys:
+    JOBS_WORKER_THREADS      worker threads started inside the web process (0 = none)
+    JOBS_POLL_INTERVAL       idle sleep between claims, seconds
+    JOBS_LOCK_TIMEOUT        running jobs older than this are assumed dead and requeued
+    JOBS_RETRY_BASE          first retry delay, seconds (doubles every attempt)
+"""
+import json
+import os
+import random
+import socket
+import threading
+import time
+import traceback
+
+import click
+from sqlalchemy import (Column, Float, Index, Integer, MetaData, String, Table, Text, func, insert, select,
+                        text, update)
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+
+metadata = MetaData()
+
+jobs_table = Table(
+    'jobs', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('name', String(120), nullable=False),
+    Column('payload', Text, nullable=False, default='{}'),
+    Column('priority', Integer, nullable=False, default=0),
+    Column('status', String(20), nullable=False, default='queued'),
+    Column('dedup_key', String(255), nullable=True),
+    Column('attempts', Integer, nullable=False, default=0),
+    Column('max_attempts', Integer, nullable=False, default=5),
+    Column('run_at', Float, nullable=False),
+    Column('created_at', Float, nullable=False),
+    Column('started_at', Float, nullable=True),
+    Column('finished_at', Float, nullable=True),
+    Column('locked_by', String(120), nullable=True),
+    Column('last_error', Text, nullable=True),
+    Index('ix_jobs_claim', 'status', 'priority', 'run_at'),
+    # At most one queued and one running job per dedup key
+    Index('ux_jobs_dedup_queued', 'dedup_key', unique=True,
+          sqlite_where=text("dedup_key IS NOT NULL AND status = 'queued'"),
+          postgresql_where=text("dedup_key IS NOT NULL AND status = 'queued'")),
+    Index('ux_jobs_dedup_running', 'dedup_key', unique=True,
+          sqlite_where=text("dedup_key IS NOT NULL AND status = 'running'"),
+          postgresql_where=text("dedup_key IS NOT NULL AND status = 'running'")),
+)
+
+JOB_STATUSES = ('queued', 'running', 'done', 'failed', 'superseded')
+
+queued_jobs = jobs_table.alias('queued_jobs')
+running_jobs = jobs_table.alias('running_jobs')
+
+
+class JobQueue:
+    """SQLite cədvəlinə əsaslanan fon iş növbəsi"""
+
+    def __init__(self, app=None, db=None):
+        self.app = app
+        self.db = db
+        self.tasks = {}
+        self.schedules = {}
+        self._threads = []
+        if app is not None:
+            self.init_app(app, db)
+
+    def init_app(self, app, db=None):
+        self.app = app
+        if db is not None:
+            self.db = db
+
+        app.config.setdefault('JOBS_WORKER_THREADS', 0)
+        app.config.setdefault('JOBS_POLL_INTERVAL', 0.5)
+        app.config.setdefault('JOBS_LOCK_TIMEOUT', 600)
+        app.config.setdefault('JOBS_RETRY_BASE', 5)
+        app.extensions['job_queue'] = self
+        app.cli.add_command(self._cli())
+
+    @property
+    def engine(self):
+        with self.app.app_context():
+            return self.db.engine
+
+    def create_table(self):
+        metadata.create_all(self.engine)
+
+    # ----------------------------------------
+    # Registration
+    # ----------------------------------------
+
+    def task(self, name=None, max_attempts=5):
+        """Funksiyanı fon işi kimi qeydiyyatdan keçir"""
+        def decorator(fn):
+            self.tasks[name or fn.__name__] = (fn, max_attempts)
+            return fn
+        return decorator
+
+    def periodic(self, every, name=None, priority=0):
+        """Tapşırığı hər `every` saniyədən bir icra et"""
+        def decorator(fn):
+            task_name = name or fn.__name__
+            self.task(task_name)(fn)
+            self.schedules[task_name] = (every, priority)
+            return fn
+        return decorator
+
+    # ----------------------------------------
+    # Producers
+    # ----------------------------------------
+
+    def enqueue(self, name, payload=None, priority=0, delay=0, run_at=None, dedup_key=None, max_attempts=None,
+                conn=None):
+        """İşi növbəyə əlavə et; eyni dedup_key ilə növbədə iş varsa onun id-sini qaytar
+
+        With ``conn`` the job is inserted in that connection's open transaction
+        (e.g. a write-queue job's), so it commits, or not, together with it.
+        """
+        if name not in self.tasks:
+            raise ValueError(f'Naməlum tapşırıq: {name}')
+
+        now = time.time()
+        values = {
+            'name': name,
+            'payload': json.dumps(payload or {}),
+            'priority': priority,
+            'status': 'queued',
+            'dedup_key': dedup_key,
+            'attempts': 0,
+            'max_attempts': max_attempts or self.tasks[name][1],
+            'run_at': run_at if run_at is not None else now + delay,
+            'created_at': now,
+        }
+
+        if conn is not None:
+            # A duplicate must not fail the caller's transaction, and a savepoint
+            # cannot be used: pysqlite would open (and commit) one of its own
+            dialect_insert = postgresql_insert if conn.dialect.name == 'postgresql' else sqlite_insert
+            result = conn.execute(dialect_insert(jobs_table).values(**values).on_conflict_do_nothing())
+            if result.rowcount:
+                return result.inserted_primary_key[0]
+            return self._queued_id(conn, dedup_key)
+
+        try:
+            with self.engine.begin() as conn:
+                return conn.execute(insert(jobs_table).values(**values)).inserted_primary_key[0]
+        except IntegrityError:
+            with self.engine.connect() as conn:
+                return self._queued_id(conn, dedup_key)
+
+    def _queued_id(self, conn, dedup_key):
+        return conn.execute(
+            select(jobs_table.c.id).where(
+                jobs_table.c.dedup_key == dedup_key,
+                jobs_table.c.status == 'queued'
+            )
+        ).scalar()
+
+    def schedule_periodic(self):
+        """Hər periodik tapşırıq üçün növbəti icranı planla (dedup ilə)"""
+        now = time.time()
+        for name, (every, priority) in self.schedules.items():
+            # Align to the interval so e.g. every=86400 runs at midnight UTC
+            next_run = (now // every + 1) * every
+            self.enqueue(name, priority=priority, run_at=next_run, dedup_key=f'periodic:{name}')
+
+    # ----------------------------------------
+    # Workers
+    # ----------------------------------------
+
+    def requeue_stale(self):
+        """Kilidi vaxtı keçmiş işləri yenidən növbəyə qaytar"""
+        now = time.time()
+        cutoff = now - self.app.config['JOBS_LOCK_TIMEOUT']
+        stale = (jobs_table.c.status == 'running') & (jobs_table.c.started_at < cutoff)
+        with self.engine.begin() as conn:
+            # A follow-up run is already queued for these keys and replaces them
+            conn.execute(
+                update(jobs_table)
+                .where(stale, jobs_table.c.dedup_key.in_(
+                    select(queued_jobs.c.dedup_key).where(queued_jobs.c.status == 'queued')
+                ))
+                .values(status='superseded', locked_by=None, finished_at=now)
+            )
+            conn.execute(update(jobs_table).where(stale).values(status='queued', locked_by=None))
+
+    def claim(self, worker_id):
+        """Növbəti hazır işi atomik olaraq götür"""
+        now = time.time()
+        with self.engine.begin() as conn:
+            candidates = conn.execute(
+                select(jobs_table.c.id)
+                .where(jobs_table.c.status == 'queued', jobs_table.c.run_at <= now)
+                # Never run two jobs with the same dedup key at once
+                .where(~select(running_jobs.c.id).where(
+                    running_jobs.c.dedup_key == jobs_table.c.dedup_key,
+                    running_jobs.c.status == 'running'
+                ).exists())
+                .order_by(jobs_table.c.priority.desc(), jobs_table.c.run_at, jobs_table.c.id)
+                .limit(5)
+            ).scalars().all()
+
+            for job_id in candidates:
+                claimed = conn.execute(
+                    update(jobs_table)
+                    .where(jobs_table.c.id == job_id, jobs_table.c.status == 'queued')
+                    .values(status='running', started_at=now, locked_by=worker_id,
+                            attempts=jobs_table.c.attempts + 1)
+                ).rowcount
+                if claimed:
+                    return conn.execute(select(jobs_table).where(jobs_table.c.id == job_id)).mappings().first()
+        return None
+
+    def execute(self, job):
+        """İşi icra et və nəticəni cədvələ yaz"""
+        fn, _ = self.tasks.get(job['name'], (None, None))
+        try:
+            if fn is None:
+                raise LookupError(f"Naməlum tapşırıq: {job['name']}")
+            with self.app.app_context():
+                try:
+                    fn(**json.loads(job['payload']))
+                finally:
+                    self.db.session.remove()
+        except Exception:
+            error = traceback.format_exc(limit=5)
+            print(f"Job {job['id']} ({job['name']}) failed: {error.strip().splitlines()[-1]}")
+            self._fail(job, error)
+            return False
+
+        with self.engine.begin() as conn:
+            conn.execute(
+                update(jobs_table).where(jobs_table.c.id == job['id'])
+                .values(status='done', finished_at=time.time(), locked_by=None, last_error=None)
+            )
+        if job['name'] in self.schedules:
+            self.schedule_periodic()
+        return True
+
+    def _fail(self, job, error):
+        now = time.time()
+        if job['attempts'] < job['max_attempts']:
+            backoff = self.app.config['JOBS_RETRY_BASE'] * 2 ** (job['attempts'] - 1)
+            values = dict(status='queued', run_at=now + backoff * random.uniform(0.8, 1.2))
+        else:
+            values = dict(status='failed', finished_at=now)
+
+        try:
+            with self.engine.begin() as conn:
+                conn.execute(
+                    update(jobs_table).where(jobs_table.c.id == job['id'])
+                    .values(locked_by=None, last_error=error, **values)
+                )
+        except IntegrityError:
+            # A follow-up run with the same dedup key is already queued
+            with self.engine.begin() as conn:
+                conn.execute(
+                    update(jobs_table).where(jobs_table.c.id == job['id'])
+                    .values(status='superseded', finished_at=now, locked_by=None, last_error=error)
+                )
+
+    def work(self, worker_id=None, stop_event=None, burst=False):
+        """İşçi dövrü; burst=True olduqda növbə boşalanda dayanır"""
+        worker_id = worker_id or f'{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}'
+        poll = self.app.config['JOBS_POLL_INTERVAL']
+        last_maintenance = 0.0
+
+        while stop_event is None or not stop_event.is_set():
+            try:
+                if time.time() - last_maintenance > 60:
+                    self.requeue_stale()
+                    self.schedule_periodic()
+                    last_maintenance = time.time()
+
+                job = self.claim(worker_id)
+                if job is None:
+                    if burst:
+                        return
+                    time.sleep(poll)
+                    continue
+                self.execute(job)
+            except Exception as e:
+                # e.g. "database is locked": a dead thread would silently stop the queue
+                print(f"Job worker error ({worker_id}): {str(e)}")
+                time.sleep(poll)
+
+    def start_workers(self, count=None):
+        """Veb prosesinin daxilində işçi axınları başlat"""
+        count = self.app.config['JOBS_WORKER_THREADS'] if count is None else count
+        if not count or self._threads:
+            return
+        self.create_table()
+        for i in range(count):
+            thread = threading.Thread(target=self.work, name=f'job-worker-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    # ----------------------------------------
+    # Monitoring
+    # ----------------------------------------
+
+    def stats(self, window=3600):
+        """Növbə dərinliyi və iş gecikməsi"""
+        now = time.time()
+        with self.engine.connect() as conn:
+            depth = dict(conn.execute(
+                select(jobs_table.c.status, func.count()).group_by(jobs_table.c.status)
+            ).all())
+            oldest_ready = conn.execute(
+                select(func.min(jobs_table.c.run_at))
+                .where(jobs_table.c.status == 'queued', jobs_table.c.run_at <= now)
+            ).scalar()
+            latency = conn.execute(
+                select(func.avg(jobs_table.c.started_at - jobs_table.c.run_at),
+                       func.max(jobs_table.c.started_at - jobs_table.c.run_at),
+                       func.avg(jobs_table.c.finished_at - jobs_table.c.started_at),
+                       func.count())
+                .where(jobs_table.c.status == 'done', jobs_table.c.finished_at >= now - window)
+            ).first()
+
+        return {
+            'depth': {status: depth.get(status, 0) for status in JOB_STATUSES},
+            'oldest_ready_age': round(now - oldest_ready, 3) if oldest_ready else 0,
+            'window_seconds': window,
+            'completed': latency[3],
+            'avg_wait': round(latency[0] or 0, 3),
+            'max_wait': round(latency[1] or 0, 3),
+            'avg_runtime': round(latency[2] or 0, 3),
+        }
+
+    # ----------------------------------------
+    # CLI
+    # ----------------------------------------
+
+    def _cli(self):
+        queue = self
+
+        @click.group('jobs')
+        def jobs_cli():
+            """Fon iş növbəsi"""
+
+        @jobs_cli.command('worker')
+        @click.option('--threads', default=1, help='İşçi axınlarının sayı')
+        @click.option('--burst', is_flag=True, help='Növbə boşalanda dayan')
+        def worker_command(threads, burst):
+            """İşçiləri işə sal"""
+            queue.create_table()
+            print(f"🚀 {threads} işçi işə başladı")
+            workers = [threading.Thread(target=queue.work, kwargs={'burst': burst}, daemon=True)
+                       for _ in range(threads)]
+            for thread in workers:
+                thread.start()
+            try:
+                for thread in workers:
+                    while thread.is_alive():
+                        thread.join(1)
+            except KeyboardInterrupt:
+                print("İşçilər dayandırıldı")
+
+        @jobs_cli.command('stats')
+        def stats_command():
+            """Növbə statistikası"""
+            queue.create_table()
+            print(json.dumps(queue.stats(), indent=2))
+
+        return jobs_cli
@@ -0,0 +1,208 @@
+"""
+Vectorized seasonal pricing engine.
+
+The nightly rate of a place is its base ``Place.price`` times the seasonal
+multiplier and the weekend multiplier of that night, for ``horizon`` days from
+today.  The day factors are the same for every place, so one cumulative sum
+``F`` of them is shared and a stay costs ``price * (F[end] - F[start])``:
+memory is two arrays of N entries (sorted ids, prices) and thousands of quotes
+are a single vectorized expression.  The per-night total is multiplied by the
+number of guests and the multiplier of their guest tier.
+
+Config keys (the defaults keep the plain ``price * guests * nights`` totals):
+    PRICING_HORIZON_DAYS         days ahead that can be quoted
+    PRICING_SEASONS              list of ("MM-DD", "MM-DD", multiplier), inclusive
+    PRICING_WEEKEND_MULTIPLIER   multiplier for Friday and Saturday nights
+    PRICING_GUEST_TIERS          list of (min_guests, multiplier)
+"""
+import threading
+from datetime import date, timedelta
+
+import numpy as np
+from sqlalchemy import event, select
+
+
+class PricingEngine:
+    """Məkanlar üçün gecəlik qiymət təqvimləri"""
+
+    def __init__(self, model):
+        self.model = model
+        self.loaded = False
+        self.horizon = 366
+        self.seasons = []
+        self.weekend_multiplier = 1.0
+        self.guest_tiers = [(1, 1.0)]
+        self.epoch = date.today()
+        self.factor_cum = np.zeros(1, dtype=np.float64)
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.prices = np.zeros(0, dtype=np.float64)
+        self._changed_during_rebuild = None
+        self._lock = threading.Lock()
+        self._rebuild_lock = threading.Lock()
+
+    def init_app(self, app):
+        app.config.setdefault('PRICING_HORIZON_DAYS', 366)
+        app.config.setdefault('PRICING_SEASONS', [])
+        app.config.setdefault('PRICING_WEEKEND_MULTIPLIER', 1.0)
+        app.config.setdefault('PRICING_GUEST_TIERS', [(1, 1.0)])
+
+        self.horizon = app.config['PRICING_HORIZON_DAYS']
+        self.seasons = app.config['PRICING_SEASONS']
+        self.weekend_multiplier = app.config['PRICING_WEEKEND_MULTIPLIER']
+        self.guest_tiers = sorted(app.config['PRICING_GUEST_TIERS'])
+        self.loaded = False
+
+    # ----------------------------------------
+    # Rates
+    # ----------------------------------------
+
+    def _factor_cum(self, epoch):
+        """Mövsüm və həftəsonu əmsallarının kumulyativ cəmi (epoch-dan başlayaraq)"""
+        days = [epoch + timedelta(days=i) for i in range(self.horizon)]
+        factors = np.ones(self.horizon, dtype=np.float64)
+
+        mmdd = np.array([d.strftime('%m-%d') for d in days])
+        for start, end, multiplier in self.seasons:
+            if start <= end:
+                in_season = (mmdd >= start) & (mmdd <= end)
+            else:
+                # Seasons such as "12-20" .. "01-10" wrap around the new year
+                in_season = (mmdd >= start) | (mmdd <= end)
+            factors[in_season] *= multiplier
+
+        weekday = np.array([d.weekday() for d in days])
+        factors[(weekday == 4) | (weekday == 5)] *= self.weekend_multiplier
+        return np.concatenate(([0.0], np.cumsum(factors)))
+
+    def rebuild(self, engine):
+        """Qiymətləri primary bazadan yenidən yüklə"""
+        with self._rebuild_lock:
+            self._load(engine)
+
+    def ensure_loaded(self, engine):
+        if not self.loaded:
+            with self._rebuild_lock:
+                if not self.loaded:
+                    self._load(engine)
+        elif self.epoch != date.today() and self._rebuild_lock.acquire(blocking=False):
+            # The window starts today, so it moves once the day rolls over.  Other
+            # requests keep quoting meanwhile: indexes are relative to the old epoch.
+            try:
+                if self.epoch != date.today():
+                    self._load(engine)
+            finally:
+                self._rebuild_lock.release()
+
+    def _load(self, engine):
+        with self._lock:
+            # Changes committed while the SELECT runs are replayed after the swap
+            self._changed_during_rebuild = {}
+        try:
+            model = self.model
+            with engine.connect() as conn:
+                rows = conn.execute(select(model.id, model.price).order_by(model.id)).all()
+
+            epoch = date.today()
+            factor_cum = self._factor_cum(epoch)
+            ids = np.array([row[0] for row in rows], dtype=np.int64)
+            prices = np.array([row[1] or 0 for row in rows], dtype=np.float64)
+
+            with self._lock:
+                self.epoch, self.factor_cum = epoch, factor_cum
+                self.ids, self.prices = ids, prices
+                self.loaded = True
+                for place_id, price in self._changed_during_rebuild.items():
+                    self._apply(place_id, price)
+        finally:
+            with self._lock:
+                self._changed_during_rebuild = None
+
+    def _apply(self, place_id, price):
+        index = int(np.searchsorted(self.ids, place_id))
+        if index < len(self.ids) and self.ids[index] == place_id:
+            self.prices[index] = np.nan if price is None else price
+        elif price is not None:
+            self.ids = np.insert(self.ids, index, place_id)
+            self.prices = np.insert(self.prices, index, price)
+
+    def update_place(self, place_id, price):
+        """Bir məkanın qiymətini yenilə və ya əlavə et"""
+        with self._lock:
+            if self._changed_during_rebuild is not None:
+                self._changed_during_rebuild[place_id] = price or 0
+            if self.loaded:
+                self._apply(place_id, price or 0)
+
+    def remove_place(self, place_id):
+        with self._lock:
+            if self._changed_during_rebuild is not None:
+                self._changed_during_rebuild[place_id] = None
+            if self.loaded:
+                self._apply(place_id, None)
+
+    def watch(self, session_class):
+        """Commit olunan qiymət dəyişikliklərini tətbiq et"""
+        model = self.model
+
+        @event.listens_for(session_class, 'after_flush')
+        def collect(db_session, flush_context):
+            pending = db_session.info.setdefault('pricing_changes', {})
+            for obj in list(db_session.new) + list(db_session.dirty):
+                if isinstance(obj, model):
+                    pending[obj.id] = obj.price
+            for obj in db_session.deleted:
+                if isinstance(obj, model):
+                    pending[obj.id] = None
+
+        @event.listens_for(session_class, 'after_commit')
+        def apply(db_session):
+            for place_id, price in db_session.info.pop('pricing_changes', {}).items():
+                if price is None:
+                    self.remove_place(place_id)
+                else:
+                    self.update_place(place_id, price)
+
+        @event.listens_for(session_class, 'after_rollback')
+        def discard(db_session):
+            db_session.info.pop('pricing_changes', None)
+
+    # ----------------------------------------
+    # Quotes
+    # ----------------------------------------
+
+    def quote_many(self, place_ids, starts, ends, guests, base_prices=None):
+        """Vektorlaşdırılmış qiymət hesabı; hesablana bilməyənlər üçün NaN
+
+        base_prices overrides the cached nightly prices (e.g. a freshly loaded place).
+        """
+        place_ids = np.asarray(place_ids, dtype=np.int64)
+        guests = np.asarray(guests, dtype=np.float64)
+        with self._lock:
+            # ids and prices are replaced together, so this pair is consistent
+            ids, prices, factor_cum, epoch = self.ids, self.prices, self.factor_cum, self.epoch
+        start_idx = np.array([(d - epoch).days for d in starts], dtype=np.int64)
+        end_idx = np.array([(d - epoch).days for d in ends], dtype=np.int64)
+
+        if base_prices is not None:
+            price = np.array([p or 0 for p in base_prices], dtype=np.float64)
+        elif len(ids):
+            found = np.minimum(np.searchsorted(ids, place_ids), len(ids) - 1)
+            price = np.where(ids[found] == place_ids, prices[found], np.nan)
+        else:
+            price = np.full(len(place_ids), np.nan)
+
+        valid = ~np.isnan(price) & (start_idx >= 0) & (end_idx > start_idx) & (end_idx <= self.horizon) & (guests >= 1)
+        nightly = price * (factor_cum[np.where(valid, end_idx, 0)] - factor_cum[np.where(valid, start_idx, 0)])
+
+        tier_min = np.array([t[0] for t in self.guest_tiers], dtype=np.float64)
+        tier_mult = np.array([t[1] for t in self.guest_tiers], dtype=np.float64)
+        tier = np.clip(np.searchsorted(tier_min, guests, side='right') - 1, 0, len(tier_min) - 1)
+
+        totals = nightly * guests * tier_mult[tier]
+        return np.where(valid, np.round(totals, 2), np.nan)
+
+    def quote(self, place_id, start, end, guests, base_price=None):
+        """Tək qiymət; hesablana bilmirsə None"""
+        base_prices = None if base_price is None else [base_price]
+        total = self.quote_many([place_id], [start], [end], [guests], base_prices)[0]
+        return None if np.isnan(total) else float(total)
@@ -0,0 +1,362 @@
+"""
+Horizontal sharding of bookings and favorites.
+
+``bookings`` are partitioned by ``place_id`` and ``favorites`` by ``user_id``
+across N SQLite files (any SQLAlchemy URI works) with a consistent-hash ring,
+so adding a shard only moves ~1/N of the rows.  Every shard has its own scoped
+session and its own group-commit ``WriteQueue``, so shards commit in parallel.
+
+Without ``SHARD_URIS`` there is a single ``primary`` shard backed by
+``db.session`` and the app-wide write queue, i.e. the endpoints behave exactly
+as before and still go through the same router calls.  When sharding is turned
+on, rows written before that are still in the primary's tables: the primary is
+kept as a legacy source that ``flask shards rebalance`` drains into the shards.
+
+Config keys:
+    SHARD_URIS            list of "name=uri" (or bare URIs, named shard0..N-1)
+    SHARD_VNODES          virtual nodes per shard on the ring
+    SHARD_REBALANCING     True while ``flask shards rebalance`` moves rows:
+                          keyed reads and writes then look at every shard
+    SHARD_ID_BLOCK        ids reserved per process at a time
+
+Rows in sharded mode get globally unique ids from ``new_id()``, because
+per-file autoincrement ids would collide.  Ids are handed out hi/lo style:
+each process reserves a block from a counter row in the primary database
+(one atomic UPDATE per block), so they never collide across processes and
+stay small enough for JavaScript clients.
+"""
+import bisect
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import click
+from sqlalchemy import (Column, Integer, MetaData, String, Table, create_engine, delete, func, insert, inspect,
+                        select, update)
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import scoped_session, sessionmaker
+
+from write_queue import WriteQueue
+
+metadata = MetaData()
+
+# Lives in the primary database: next free id for rows of sharded tables
+id_blocks_table = Table(
+    'shard_id_blocks', metadata,
+    Column('name', String(50), primary_key=True),
+    Column('next_id', Integer, nullable=False),
+)
+
+
+def _hash(value):
+    return int.from_bytes(hashlib.md5(str(value).encode()).digest()[:8], 'big')
+
+
+class HashRing:
+    """Virtual node-lu consistent hashing halqası"""
+
+    def __init__(self, nodes, vnodes=128):
+        points = sorted((_hash(f'{node}#{i}'), node) for node in nodes for i in range(vnodes))
+        self._hashes = [h for h, _ in points]
+        self._nodes = [node for _, node in points]
+
+    def node_for(self, key):
+        index = bisect.bisect(self._hashes, _hash(key)) % len(self._hashes)
+        return self._nodes[index]
+
+
+class Shard:
+    """Bir shard: engine, scoped sessiya və yazma növbəsi"""
+
+    def __init__(self, name, engine, session, queue):
+        self.name = name
+        self.engine = engine
+        self.session = session
+        self.queue = queue
+
+
+class ShardRouter:
+    """Sharded cədvəllər üçün yönləndirici"""
+
+    def __init__(self, app=None, db=None, tables=None, primary_queue=None):
+        self.shards = {}
+        self.tables = tables or {}
+        self.enabled = False
+        self.legacy = None
+        self._ring = None
+        self._id_lock = threading.Lock()
+        self._next_id = self._block_end = 0
+        self._executor = None
+        if app is not None:
+            self.init_app(app, db, tables, primary_queue)
+
+    def init_app(self, app, db, tables, primary_queue):
+        """tables = {'bookings': (Booking, 'place_id'), 'favorites': (Favorite, 'user_id')}"""
+        self.app = app
+        self.db = db
+        self.tables = tables
+
+        app.config.setdefault('SHARD_URIS', [])
+        app.config.setdefault('SHARD_VNODES', 128)
+        app.config.setdefault('SHARD_REBALANCING', False)
+        app.config.setdefault('SHARD_ID_BLOCK', 1000)
+        app.extensions['shard_router'] = self
+
+        uris = app.config['SHARD_URIS']
+        self.enabled = bool(uris)
+
+        if not self.enabled:
+            self.shards = {'primary': Shard('primary', None, db.session, primary_queue)}
+        else:
+            for i, spec in enumerate(uris):
+                name, uri = spec.split('=', 1) if '=' in spec.split('://')[0] else (f'shard{i}', spec)
+                engine = create_engine(uri)
+                session = scoped_session(sessionmaker(bind=engine))
+                queue = WriteQueue(app, db, session=session, engine=engine)
+                self.shards[name] = Shard(name, engine, session, queue)
+
+            # Rows from before sharding was enabled, until rebalance moves them
+            self.legacy = Shard('primary', None, db.session, primary_queue)
+            self._executor = ThreadPoolExecutor(max_workers=len(self.shards) + 1, thread_name_prefix='shard')
+
+            @app.teardown_appcontext
+            def remove_shard_sessions(exc):
+                for shard in self.shards.values():
+                    shard.session.remove()
+
+        self._ring = HashRing(list(self.shards), app.config['SHARD_VNODES'])
+        app.cli.add_command(self._cli())
+
+    # ----------------------------------------
+    # Routing
+    # ----------------------------------------
+
+    def shard_for(self, table, key):
+        """Açar üçün sahib shard"""
+        return self.shards[self._ring.node_for(key)]
+
+    def shards_for(self, table, key):
+        """Açarın sətirləri ola biləcək shard-lar (sahib birinci)"""
+        owner = self.shard_for(table, key)
+        if not self.rebalancing:
+            return [owner]
+        return [owner] + [shard for shard in self._sources() if shard is not owner]
+
+    def previous_shards(self, table, key):
+        """Rebalans zamanı açarın köhnə sətirləri ola biləcək shard-lar (sahibdən başqa)"""
+        return self.shards_for(table, key)[1:]
+
+    @property
+    def rebalancing(self):
+        return self.enabled and self.app.config['SHARD_REBALANCING']
+
+    def _sources(self):
+        """Sətir ola biləcək bütün yerlər: shard-lar və köhnə primary cədvəlləri"""
+        return list(self.shards.values()) + ([self.legacy] if self.legacy else [])
+
+    def engines(self):
+        """Bütün shard engine-ləri (sharding yoxdursa boş siyahı)"""
+        return [shard.engine for shard in self.shards.values()] if self.enabled else []
+
+    def new_id(self):
+        """Shard-lar arası unikal id (sharding yoxdursa None = autoincrement)"""
+        if not self.enabled:
+            return None
+        with self._id_lock:
+            if self._next_id >= self._block_end:
+                self._reserve_block()
+            new_id = self._next_id
+            self._next_id += 1
+            return new_id
+
+    def _reserve_block(self):
+        size = self.app.config['SHARD_ID_BLOCK']
+        blocks = id_blocks_table
+        with self._primary_engine().begin() as conn:
+            # The UPDATE takes the write lock, so the SELECT sees our own reservation
+            updated = conn.execute(
+                update(blocks).where(blocks.c.name == 'ids').values(next_id=blocks.c.next_id + size)
+            ).rowcount
+            if not updated:
+                raise RuntimeError('shard_id_blocks boşdur: `flask shards init` işlədin')
+            end = conn.execute(select(blocks.c.next_id).where(blocks.c.name == 'ids')).scalar()
+        self._next_id, self._block_end = end - size, end
+
+    def _primary_engine(self):
+        with self.app.app_context():
+            return self.db.engine
+
+    # ----------------------------------------
+    # Reads and writes
+    # ----------------------------------------
+
+    def run_write(self, shard, job):
+        """job(session) shard-ın yazma növbəsində icra olunur"""
+        return shard.queue.run(lambda: job(shard.session))
+
+    def query_keyed(self, table, key, fn):
+        """Açar üzrə oxuma: fn(session) nəticələrini birləşdir"""
+        results = []
+        for shard in self.shards_for(table, key):
+            results.extend(fn(shard.session))
+        return results
+
+    def scatter(self, fn):
+        """fn(session) bütün shard-larda paralel icra olunur (scatter-gather)"""
+        if not self.enabled:
+            return list(fn(self.shards['primary'].session))
+
+        def run(shard):
+            with self.app.app_context():
+                try:
+                    return list(fn(shard.session))
+                finally:
+                    shard.session.remove()
+
+        shards = self._sources() if self.rebalancing else self.shards.values()
+        results = []
+        for rows in self._executor.map(run, shards):
+            results.extend(rows)
+        return results
+
+    # ----------------------------------------
+    # Maintenance
+    # ----------------------------------------
+
+    def create_tables(self):
+        for shard in self.shards.values():
+            if shard.engine is None:
+                continue
+            for model, _ in self.tables.values():
+                model.__table__.create(shard.engine, checkfirst=True)
+
+        if not self.enabled:
+            return
+        primary = self._primary_engine()
+        metadata.create_all(primary)
+        with primary.connect() as conn:
+            exists = conn.execute(select(id_blocks_table.c.next_id)).first()
+        if exists is None:
+            # Start above every id already in use (primary tables included)
+            start = max(self._max_ids()) + 1
+            try:
+                with primary.begin() as conn:
+                    conn.execute(insert(id_blocks_table).values(name='ids', next_id=start))
+            except IntegrityError:
+                pass  # another process initialized it first
+
+    def _max_ids(self):
+        yield 0
+        for engine in [self._primary_engine()] + self.engines():
+            with engine.connect() as conn:
+                for model, _ in self.tables.values():
+                    if inspect(conn).has_table(model.__tablename__):
+                        yield conn.execute(select(func.max(model.__table__.c.id))).scalar() or 0
+
+    def rebalance(self, batch_size=500):
+        """Sahibi dəyişmiş sətirləri yeni shard-larına köçür (onlayn)"""
+        result = {}
+        for table_name, (model, key_column) in self.tables.items():
+            table = model.__table__
+            stats = result[table_name] = {'moved': 0, 'conflicts': 0}
+
+            # The primary's own tables are drained too (rows from before sharding)
+            for source in self._sources():
+                source_engine = source.engine or self._primary_engine()
+                with source_engine.connect() as conn:
+                    if not inspect(conn).has_table(table.name):
+                        continue
+                last_id = None
+                while True:
+                    query = select(table).order_by(table.c.id).limit(batch_size)
+                    if last_id is not None:
+                        query = query.where(table.c.id > last_id)
+                    with source_engine.connect() as conn:
+                        rows = conn.execute(query).mappings().all()
+                    if not rows:
+                        break
+                    last_id = rows[-1]['id']
+
+                    by_target = {}
+                    for row in rows:
+                        target = self.shard_for(table_name, row[key_column])
+                        if target is not source:
+                            by_target.setdefault(target.name, []).append(dict(row))
+
+                    for target_name, target_rows in by_target.items():
+                        moved, conflicts = self._move_rows(table, source_engine, self.shards[target_name], target_rows)
+                        stats['moved'] += moved
+                        stats['conflicts'] += conflicts
+        return result
+
+    def _move_rows(self, table, source_engine, target, rows):
+        """Sətirləri hədəfə köçür, sonra mənbədən sil; (köçən, konflikt) sayı"""
+        # Copy first, then delete: a row is never missing, at worst briefly duplicated
+        with target.engine.begin() as conn:
+            existing = {
+                row['id']: dict(row) for row in
+                conn.execute(select(table).where(table.c.id.in_([r['id'] for r in rows]))).mappings()
+            }
+            fresh = [r for r in rows if r['id'] not in existing]
+            if fresh:
+                conn.execute(insert(table), fresh)
+
+        # Only rows now on the target with identical contents are deleted; an id
+        # taken by a different row is a conflict and stays on the source
+        moved = 0
+        with source_engine.begin() as conn:
+            for row in rows:
+                if existing.get(row['id'], row) != row:
+                    continue
+                # Matching every column also keeps rows changed since they were read
+                moved += conn.execute(delete(table).where(*[
+                    table.c[name].is_(None) if value is None else table.c[name] == value
+                    for name, value in row.items()
+                ])).rowcount
+        if moved < len(rows):
+            print(f"Rebalance: {len(rows) - moved} {table.name} rows left on the source (id conflict or changed)")
+        return moved, len(rows) - moved
+
+    def counts(self):
+        """Hər shard-da hər cədvəlin sətir sayı"""
+        result = {}
+        for shard in self._sources():
+            engine = shard.engine
+            if engine is None:
+                with self.app.app_context():
+                    engine = self.db.engine
+            with engine.connect() as conn:
+                # None = table not created yet (run `flask shards init`)
+                result[shard.name] = {
+                    name: conn.execute(select(func.count()).select_from(model.__table__)).scalar()
+                    if inspect(conn).has_table(model.__tablename__) else None
+                    for name, (model, _) in self.tables.items()
+                }
+        return result
+
+    def _cli(self):
+        router = self
+
+        @click.group('shards')
+        def shards_cli():
+            """Bookings/favorites shard-ları"""
+
+        @shards_cli.command('init')
+        def init_command():
+            """Shard bazalarında cədvəlləri yarat"""
+            router.create_tables()
+            print(f"✅ {len(router.shards)} shard hazırdır")
+
+        @shards_cli.command('rebalance')
+        @click.option('--batch-size', default=500)
+        def rebalance_command(batch_size):
+            """Sətirləri halqaya görə köçür (SHARD_REBALANCING=1 ilə işlədin)"""
+            router.create_tables()
+            print(router.rebalance(batch_size))
+
+        @shards_cli.command('stats')
+        def stats_command():
+            """Shard-lar üzrə sətir sayları"""
+            print(router.counts())
+
+        return shards_cli
@@ -0,0 +1,104 @@
+import os
+import sqlite3
+
+import pytest
+from sqlalchemy import create_engine
+
+from analytics import USER_COLUMNS, AnalyticsError, Snapshot, _restart_limit, backup_copy, export_snapshot
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / 'live.db'
+    conn = sqlite3.connect(path)
+    conn.execute(f"CREATE TABLE users ({', '.join(USER_COLUMNS)})")
+    conn.execute('CREATE TABLE places (id, category, region)')
+    conn.execute('CREATE TABLE bookings (id, user_id, place_id, guests, total_price, status, start_date, end_date)')
+    users = [(1, 'kişi', 30, 2, 'Bakı', 2, 1000, 'Qəbələ', 'dag', 5, 100, 'Bronze'),
+             (2, 'qadın', 40, 3, 'Gəncə', 1, 500, 'Şəki', 'deniz', 3, 50, 'Bronze'),
+             (3, 'qadın', 25, 1, 'Bakı', 4, 2000, 'Quba', 'dag', 4, 0, 'Silver'),
+             (4, 'kişi', None, 1, 'Bakı', 1, 300, 'Quba', 'dag', 1, 0, 'Bronze')]
+    conn.executemany(f"INSERT INTO users VALUES ({', '.join('?' * len(USER_COLUMNS))})", users)
+    conn.executemany('INSERT INTO places VALUES (?, ?, ?)', [(1, 'dag', 'Quba'), (2, 'deniz', 'Abşeron')])
+    conn.executemany('INSERT INTO bookings VALUES (?, ?, ?, ?, ?, ?, ?, ?)', [
+        (1, 1, 1, 2, 200.0, 'confirmed', '2027-01-10', '2027-01-12'),
+        (2, 1, 2, 2, 300.0, 'confirmed', '2027-01-10', '2027-01-13'),
+        (3, 2, 2, 1, 100.0, 'cancelled', '2027-02-01', '2027-02-02'),
+    ])
+    conn.commit()
+    conn.close()
+    return create_engine(f'sqlite:///{path}')
+
+
+@pytest.fixture
+def snapshot(source, tmp_path):
+    directory = tmp_path / 'analytics'
+    export_snapshot(source, str(directory))
+    return Snapshot(str(directory))
+
+
+def test_group_by_with_aggregates(snapshot):
+    rows = snapshot.query('bookings', group_by=['place_region'], metrics=['count', 'sum:total_price', 'avg:nights'])
+
+    assert rows == [
+        {'place_region': 'Abşeron', 'count': 2, 'sum:total_price': 400.0, 'avg:nights': 2.0},
+        {'place_region': 'Quba', 'count': 1, 'sum:total_price': 200.0, 'avg:nights': 2.0},
+    ]
+
+
+def test_where_compares_whole_strings(snapshot):
+    assert snapshot.query('users', where={'region': 'Bakı'}) == [{'count': 3}]
+    # Casting to the column's fixed-width dtype used to truncate this to 'Bakı'
+    assert snapshot.query('users', where={'region': 'Bakıxyz'}) == []
+
+
+def test_where_converts_numbers(snapshot):
+    assert snapshot.query('users', where={'age': '40'}) == [{'count': 1}]
+    assert snapshot.query('bookings', where={'user_id': '1'}, metrics=['count', 'sum:total_price']) == \
+        [{'count': 2, 'sum:total_price': 500.0}]
+
+
+def test_where_rejects_non_numeric_value_for_numeric_column(snapshot):
+    with pytest.raises(AnalyticsError):
+        snapshot.query('users', where={'age': 'x'})
+
+
+def test_unknown_names_are_rejected(snapshot):
+    with pytest.raises(AnalyticsError):
+        snapshot.query('users', group_by=['password'])
+    with pytest.raises(AnalyticsError):
+        snapshot.query('users', metrics=['avg:region'])
+
+
+def test_backup_copy_exports_without_reading_the_live_file(source, tmp_path):
+    with backup_copy(source) as copy:
+        path = copy.url.database
+        assert path != source.url.database
+        exported = export_snapshot(copy, str(tmp_path / 'analytics'))
+
+    assert exported == {'users': 4, 'bookings': 3}
+    assert not os.path.exists(path)
+
+
+def test_count_of_a_column_skips_nulls(snapshot):
+    rows = snapshot.query('users', group_by=['gender'], metrics=['count', 'count:age', 'avg:age'])
+
+    assert rows == [
+        {'gender': 'kişi', 'count': 2, 'count:age': 1, 'avg:age': 30.0},
+        {'gender': 'qadın', 'count': 2, 'count:age': 2, 'avg:age': 32.5},
+    ]
+
+
+def test_backup_gives_up_after_too_many_restarts():
+    progress = _restart_limit(2)
+    for remaining in (9, 8, 7, 9, 8, 9):
+        progress(0, remaining, 10)
+
+    with pytest.raises(RuntimeError):
+        progress(0, 9, 10)
+
+
+def test_stepped_backup_copies_everything(source):
+    with backup_copy(source, pages=1, sleep=0) as copy:
+        with copy.connect() as conn:
+            assert conn.exec_driver_sql('SELECT COUNT(*) FROM users').scalar() == 4
@@ -0,0 +1,118 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from flask import Flask, Response, jsonify, request, session
+
+from batch import run_batch
+from db_routing import read_only
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = 'test'
+    executor = ThreadPoolExecutor(max_workers=4)
+    log = []
+    # Both reads of a batch must be in flight together to pass the barrier
+    barrier = threading.Barrier(2, timeout=5)
+
+    @app.route('/api/batch', methods=['POST'])
+    def api_batch():
+        return jsonify({'responses': run_batch(app, request.get_json()['requests'], executor)})
+
+    @app.route('/api/read/<name>', methods=['GET'])
+    @read_only
+    def api_read(name):
+        if name.startswith('together'):
+            barrier.wait()
+        log.append(('read', name))
+        return jsonify({'name': name, 'thread': threading.current_thread().name})
+
+    @app.route('/api/write/<name>', methods=['POST'])
+    def api_write(name):
+        log.append(('write', name))
+        return jsonify({'name': name, 'body': request.get_json()})
+
+    @app.route('/api/login', methods=['POST'])
+    def api_login():
+        session['user_id'] = request.get_json()['user_id']
+        return jsonify({'success': True})
+
+    @app.route('/api/me', methods=['GET'])
+    @read_only
+    def api_me():
+        return jsonify({'user_id': session.get('user_id')})
+
+    @app.route('/api/stream', methods=['GET'])
+    @read_only
+    def api_stream():
+        return Response(iter(['data: 1\n\n']), mimetype='text/event-stream')
+
+    client = app.test_client()
+    client.log = log
+    yield client
+    executor.shutdown()
+
+
+def batch(client, *items):
+    response = client.post('/api/batch', json={'requests': list(items)})
+    assert response.status_code == 200
+    return response.get_json()['responses']
+
+
+def test_results_keep_request_order(client):
+    responses = batch(client,
+                      {'path': '/api/read/a'},
+                      {'id': 'w', 'method': 'POST', 'path': '/api/write/b', 'body': {'x': 1}},
+                      {'path': '/api/missing'})
+
+    assert [r['id'] for r in responses] == [0, 'w', 2]
+    assert [r['status'] for r in responses] == [200, 200, 404]
+    assert responses[0]['body']['name'] == 'a'
+    assert responses[1]['body'] == {'name': 'b', 'body': {'x': 1}}
+
+
+def test_consecutive_reads_run_concurrently(client):
+    responses = batch(client, {'path': '/api/read/together1'}, {'path': '/api/read/together2'})
+
+    assert [r['status'] for r in responses] == [200, 200]
+    assert responses[0]['body']['thread'] != responses[1]['body']['thread']
+
+
+def test_writes_are_barriers(client):
+    batch(client,
+          {'path': '/api/read/r1'}, {'path': '/api/read/r2'},
+          {'method': 'POST', 'path': '/api/write/w'},
+          {'path': '/api/read/r3'})
+
+    assert client.log.index(('write', 'w')) == 2
+    assert client.log[3] == ('read', 'r3')
+
+
+def test_nested_batches_are_rejected(client):
+    inner = {'requests': [{'path': '/api/read/a'}]}
+    responses = batch(client,
+                      {'method': 'POST', 'path': '/api/batch', 'body': inner},
+                      {'method': 'POST', 'path': '/api/%62atch', 'body': inner},
+                      {'method': 'POST', 'path': '/api/batch?x=1', 'body': inner})
+
+    assert [r['status'] for r in responses] == [400, 400, 400]
+    assert all('responses' not in r['body'] for r in responses)
+
+
+def test_invalid_items_and_streams_are_rejected(client):
+    responses = batch(client, 'x', {'path': '/other'}, {'method': 'TRACE', 'path': '/api/read/a'},
+                      {'path': '/api/stream'})
+
+    assert [r['status'] for r in responses] == [400, 400, 400, 400]
+
+
+def test_session_is_shared_and_saved_with_the_batch(client):
+    responses = batch(client,
+                      {'method': 'POST', 'path': '/api/login', 'body': {'user_id': 7}},
+                      {'path': '/api/me'})
+
+    assert responses[1]['body'] == {'user_id': 7}
+    # The login inside the batch is in the batch response's cookie
+    assert client.get('/api/me').get_json() == {'user_id': 7}
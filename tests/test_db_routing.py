@@ -0,0 +1,89 @@
+import sqlite3
+import time
+
+import pytest
+from flask import Flask, g, jsonify
+from flask_sqlalchemy import SQLAlchemy
+
+from db_routing import DatabaseRouter, RoutingSession, read_only
+
+
+@pytest.fixture
+def env(tmp_path):
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = 'test'
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'primary.db'}"
+    app.config['SQLALCHEMY_REPLICA_URIS'] = [f"sqlite:///{tmp_path / 'replica.db'}"]
+    app.config['REPLICA_MAX_LAG_SECONDS'] = 0
+    app.config['REPLICA_LAG_CHECK_SECONDS'] = 0
+    app.config['REPLICA_STICKY_SECONDS'] = 0.3
+    db = SQLAlchemy(app, session_options={'class_': RoutingSession})
+    router = DatabaseRouter(app, db)
+
+    class Item(db.Model):
+        id = db.Column(db.Integer, primary_key=True)
+        name = db.Column(db.String(20), nullable=False)
+
+    @app.route('/items')
+    @read_only
+    def list_items():
+        names = [item.name for item in Item.query.order_by(Item.id)]
+        return jsonify({'source': 'replica' if g.get('db_replica') else 'primary', 'names': names})
+
+    @app.route('/items/<name>', methods=['POST'])
+    def add_item(name):
+        db.session.add(Item(name=name))
+        db.session.commit()
+        return jsonify({'success': True})
+
+    with app.app_context():
+        db.create_all()
+        db.session.add(Item(name='a'))
+        db.session.commit()
+        router.sync_sqlite_replicas()
+    return app, router, tmp_path / 'primary.db'
+
+
+def sync(app, router):
+    with app.app_context():
+        router.sync_sqlite_replicas()
+
+
+def test_reads_go_to_a_fresh_replica(env):
+    app, router, _ = env
+
+    assert app.test_client().get('/items').get_json() == {'source': 'replica', 'names': ['a']}
+
+
+def test_write_from_another_process_makes_the_replica_stale(env):
+    app, router, primary_path = env
+    # Another worker's commit: nothing in this process knows about it
+    conn = sqlite3.connect(primary_path)
+    conn.execute("INSERT INTO item (name) VALUES ('b')")
+    conn.commit()
+    conn.close()
+    client = app.test_client()
+
+    assert client.get('/items').get_json() == {'source': 'primary', 'names': ['a', 'b']}
+    sync(app, router)
+    assert client.get('/items').get_json() == {'source': 'replica', 'names': ['a', 'b']}
+
+
+def test_missing_replica_falls_back_to_the_primary(env, tmp_path):
+    app, router, _ = env
+    (tmp_path / 'replica.db').unlink()
+
+    assert app.test_client().get('/items').get_json()['source'] == 'primary'
+
+
+def test_writer_reads_from_the_primary_until_the_sticky_window_ends(env):
+    app, router, _ = env
+    writer, other = app.test_client(), app.test_client()
+
+    writer.post('/items/b')
+    sync(app, router)
+
+    assert writer.get('/items').get_json()['source'] == 'primary'
+    assert other.get('/items').get_json()['source'] == 'replica'
+    time.sleep(app.config['REPLICA_STICKY_SECONDS'])
+    assert writer.get('/items').get_json() == {'source': 'replica', 'names': ['a', 'b']}
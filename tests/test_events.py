@@ -0,0 +1,101 @@
+import pytest
+from flask import Flask, Response, jsonify
+
+from events import EventHub
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.config['EVENTS_BUFFER_SIZE'] = 3
+    app.config['EVENTS_HEARTBEAT'] = 0.05
+    app.config['EVENTS_MAX_SUBSCRIBERS'] = 2
+    hub = EventHub(app)
+
+    @app.route('/api/events')
+    def api_events():
+        subscriber = hub.subscribe({'places'})
+        if subscriber is None:
+            return jsonify({'success': False}), 503
+        response = Response(hub.stream(subscriber), mimetype='text/event-stream')
+        response.call_on_close(lambda: hub.unsubscribe(subscriber))
+        return response
+
+    app.hub = hub
+    return app
+
+
+def test_events_with_the_same_key_coalesce(app):
+    hub = app.hub
+    subscriber = hub.subscribe({'places'})
+    hub.publish('places', 'views', {'place_id': 1, 'views': 10}, key=1)
+    hub.publish('places', 'views', {'place_id': 2, 'views': 5}, key=2)
+    hub.publish('places', 'views', {'place_id': 1, 'views': 11}, key=1)
+    hub.publish('places', 'booked', {'place_id': 1})
+
+    events = subscriber.wait(0)
+
+    # Newest value wins and moves behind the events published before it
+    assert [(e['event'], e['data']) for e in events] == [
+        ('views', {'place_id': 2, 'views': 5}),
+        ('views', {'place_id': 1, 'views': 11}),
+        ('booked', {'place_id': 1}),
+    ]
+    assert subscriber.wait(0) == []
+
+
+def test_overflow_drops_the_oldest_and_sends_resync(app):
+    hub = app.hub
+    subscriber = hub.subscribe({'places'})
+    for place_id in range(5):
+        hub.publish('places', 'booked', {'place_id': place_id})
+
+    events = subscriber.wait(0)
+
+    assert events[0] == {'id': None, 'event': 'resync', 'data': {}}
+    assert [e['data']['place_id'] for e in events[1:]] == [2, 3, 4]
+    assert subscriber.wait(0) == []
+
+
+def test_only_subscribed_topics_are_delivered(app):
+    hub = app.hub
+    subscriber = hub.subscribe({'user:1'})
+
+    assert hub.publish('places', 'booked', {}) == 0
+    assert hub.publish('user:1', 'points', {'points': 5}) == 1
+    assert [e['event'] for e in subscriber.wait(0)] == ['points']
+
+
+def test_subscribers_are_limited(app):
+    hub = app.hub
+    first, second = hub.subscribe({'places'}), hub.subscribe({'places'})
+
+    assert hub.subscribe({'places'}) is None
+    assert app.test_client().get('/api/events').status_code == 503
+    hub.unsubscribe(first)
+    assert hub.subscribe({'places'}) is not None
+
+
+def test_closing_the_response_unsubscribes(app):
+    hub = app.hub
+    response = app.test_client().get('/api/events', buffered=False)
+    chunks = iter(response.response)
+
+    assert next(chunks) == b'retry: 3000\n\n'
+    hub.publish('places', 'booked', {'place_id': 7})
+    assert next(chunks) == b'id: 1\nevent: booked\ndata: {"place_id": 7}\n\n'
+    assert hub.subscriber_count == 1
+
+    response.close()
+
+    assert hub.subscriber_count == 0
+    assert hub.publish('places', 'booked', {'place_id': 7}) == 0
+
+
+def test_closing_an_unread_response_unsubscribes(app):
+    response = app.test_client().get('/api/events', buffered=False)
+    assert app.hub.subscriber_count == 1
+
+    response.close()
+
+    assert app.hub.subscriber_count == 0
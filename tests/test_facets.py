@@ -0,0 +1,91 @@
+import pytest
+from sqlalchemy import Column, Float, Integer, String, create_engine, event
+from sqlalchemy.orm import Session, declarative_base, sessionmaker
+
+from facets import FacetIndex
+
+Base = declarative_base()
+
+
+class Place(Base):
+    __tablename__ = 'places'
+    id = Column(Integer, primary_key=True)
+    category = Column(String(50))
+    region = Column(String(50))
+    price = Column(Float)
+    rating = Column(Float)
+
+
+PLACES = [
+    (1, 'dag', 'Şimal', 80, 4.9),
+    (2, 'dag', 'Şəki-Zaqatala', 60, 4.2),
+    (3, 'gol', 'Gəncə-Qazax', 50, 4.8),
+    (4, 'deniz', 'Abşeron', 120, 3.6),
+    (5, 'tarix', 'Şəki-Zaqatala', 40, 4.7),
+]
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f'sqlite:///{tmp_path / "facets.db"}')
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add_all([Place(id=i, category=c, region=r, price=p, rating=t) for i, c, r, p, t in PLACES])
+        session.commit()
+    return engine
+
+
+@pytest.fixture
+def index(engine):
+    index = FacetIndex(Place)
+    index.rebuild(engine)
+    return index
+
+
+def test_counts_leave_out_their_own_constraint(index):
+    ids, facets = index.search(categories=['dag'], min_rating=4.5)
+
+    assert ids == [1]
+    # Categories are counted under the rating filter only
+    assert facets['categories'] == {'dag': 1, 'gol': 1, 'tarix': 1}
+    assert facets['regions'] == {'Şimal': 1}
+    # Rating buckets are counted under the category filter only
+    assert facets['ratings'] == {'3.0': 2, '3.5': 2, '4.0': 2, '4.5': 1}
+    assert sum(b['count'] for b in facets['price_histogram']) == 1
+
+
+def test_price_range_and_regions(index):
+    ids, facets = index.search(regions=['Şəki-Zaqatala', 'Abşeron'], price_min=45, price_max=120)
+
+    assert ids == [2, 4]
+    assert facets['regions'] == {'Şimal': 1, 'Şəki-Zaqatala': 1, 'Gəncə-Qazax': 1, 'Abşeron': 1}
+    assert facets['categories'] == {'dag': 1, 'deniz': 1}
+
+
+def test_committed_changes_are_applied(engine, index):
+    Sessions = sessionmaker(engine)
+    index.watch(Sessions)
+
+    with Sessions() as session:
+        session.get(Place, 1).price = 200
+        session.delete(session.get(Place, 5))
+        session.add(Place(id=6, category='dag', region='Şimal', price=70, rating=4.0))
+        session.commit()
+
+    assert index.search(categories=['dag'], price_max=100)[0] == [2, 6]
+    assert index.search(categories=['tarix'])[0] == []
+
+
+def test_changes_committed_during_rebuild_are_kept(engine, index):
+    def commit_during_select(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().startswith('SELECT') and not done:
+            done.append(True)
+            # Lands after the rebuild's SELECT has read the old rows
+            index.upsert(7, 'gol', 'Şimal', 30, 5.0)
+            index.remove(3)
+
+    done = []
+    event.listen(engine, 'after_cursor_execute', commit_during_select)
+    index.rebuild(engine)
+
+    assert index.search(categories=['gol'])[0] == [7]
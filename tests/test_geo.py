@@ -0,0 +1,106 @@
+import math
+
+import pytest
+from sqlalchemy import Column, Float, Integer, create_engine, event
+from sqlalchemy.orm import Session, declarative_base
+
+import geo
+
+Base = declarative_base()
+
+
+class Place(Base):
+    __tablename__ = 'places'
+    id = Column(Integer, primary_key=True)
+    latitude = Column(Float)
+    longitude = Column(Float)
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f'sqlite:///{tmp_path / "geo.db"}')
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add_all([
+            Place(id=1, latitude=-17.0, longitude=179.8),   # Fiji, east of the antimeridian
+            Place(id=2, latitude=-17.1, longitude=-179.9),  # just across it
+            Place(id=3, latitude=-17.0, longitude=178.0),   # ~200 km west
+            Place(id=4, latitude=40.4, longitude=49.9),     # Baku
+        ])
+        session.commit()
+    return engine
+
+
+def nearby(engine, lat, lon, radius, use_rtree):
+    with Session(engine) as session:
+        query = session.query(Place.id, Place.latitude, Place.longitude)
+        rows = geo.within_box(query, Place, geo.bounding_box(lat, lon, radius), use_rtree).all()
+    return [place_id for place_id, _ in geo.nearest(rows, lat, lon, radius, 10)]
+
+
+def test_bounding_box_wraps_across_the_antimeridian():
+    south, north, west, east = geo.bounding_box(-17.0, 179.9, 50)
+
+    assert south < -17.0 < north
+    assert 179.0 < west < 179.9
+    assert -180.0 < east < -179.0
+
+
+def destination(lat, lon, distance_km, bearing):
+    """The point `distance_km` from (lat, lon) along `bearing` degrees"""
+    lat1, lon1, theta = math.radians(lat), math.radians(lon), math.radians(bearing)
+    delta = distance_km / geo.EARTH_RADIUS_KM
+    lat2 = math.asin(math.sin(lat1) * math.cos(delta) + math.cos(lat1) * math.sin(delta) * math.cos(theta))
+    lon2 = lon1 + math.atan2(math.sin(theta) * math.sin(delta) * math.cos(lat1),
+                             math.cos(delta) - math.sin(lat1) * math.sin(lat2))
+    return math.degrees(lat2), (math.degrees(lon2) + 540) % 360 - 180
+
+
+@pytest.mark.parametrize('lat, lon, radius', [(89, 0, 100), (60, 0, 1000), (40.4, 49.9, 50), (-75, 179, 300)])
+def test_bounding_box_contains_the_whole_circle(lat, lon, radius):
+    south, north, west, east = geo.bounding_box(lat, lon, radius)
+
+    for bearing in range(0, 360, 2):
+        point_lat, point_lon = destination(lat, lon, radius * 0.999, bearing)
+        assert south <= point_lat <= north
+        assert (west <= point_lon <= east) if west <= east else (point_lon >= west or point_lon <= east)
+
+
+def test_high_latitude_places_at_the_widest_point_are_found(engine):
+    # Both are inside the radius but east of r / (R cos lat) degrees
+    with Session(engine) as session:
+        session.add_all([Place(id=10, latitude=89.5632, longitude=64.05),
+                         Place(id=11, latitude=61.2577, longitude=18.2)])
+        session.commit()
+
+    assert nearby(engine, 89.0, 0.0, 100, False) == [10]
+    assert nearby(engine, 60.0, 0.0, 1000, False) == [11]
+
+
+def test_search_radii_grow_up_to_the_radius():
+    assert list(geo.search_radii(50)) == [1.0, 4.0, 16.0, 50]
+    assert list(geo.search_radii(0.5)) == [0.5]
+
+
+def test_bounding_box_covers_every_longitude_near_the_poles():
+    assert geo.bounding_box(89.9, 10.0, 50)[2:] == (-180.0, 180.0)
+    assert geo.bounding_box(60.0, 10.0, 20000)[2:] == (-180.0, 180.0)
+
+
+@pytest.mark.parametrize('use_rtree', [True, False])
+def test_nearby_finds_places_on_both_sides_of_the_antimeridian(engine, use_rtree):
+    if use_rtree:
+        assert geo.ensure_place_index(engine)
+
+    assert nearby(engine, -17.0, 179.95, 50, use_rtree) == [1, 2]
+    assert nearby(engine, -17.05, -179.95, 50, use_rtree) == [2, 1]
+    assert nearby(engine, 40.4, 49.85, 50, use_rtree) == [4]
+
+
+def test_has_rtree_is_cached_per_engine(engine):
+    assert geo.ensure_place_index(engine)
+    statements = []
+    event.listen(engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+
+    assert geo.has_rtree(engine)
+    assert statements == []
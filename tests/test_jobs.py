@@ -0,0 +1,115 @@
+import pytest
+from flask import Flask
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import select
+from sqlalchemy.exc import OperationalError
+
+from jobs import JobQueue, jobs_table
+
+
+@pytest.fixture
+def jobs(tmp_path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'jobs.db'}"
+    db = SQLAlchemy(app)
+    queue = JobQueue(app, db)
+    calls = []
+
+    @queue.task()
+    def record(value=None):
+        calls.append(value)
+
+    @queue.task(max_attempts=3)
+    def explode():
+        raise RuntimeError('boom')
+
+    queue.create_table()
+    queue.calls = calls
+    return queue
+
+
+def _status(queue, job_id):
+    with queue.engine.connect() as conn:
+        return conn.execute(select(jobs_table.c.status).where(jobs_table.c.id == job_id)).scalar()
+
+
+def test_queued_jobs_are_deduplicated(jobs):
+    first = jobs.enqueue('record', {'value': 1}, dedup_key='k')
+    second = jobs.enqueue('record', {'value': 2}, dedup_key='k')
+
+    assert first == second
+
+
+def test_enqueue_while_running_queues_a_follow_up(jobs):
+    first = jobs.enqueue('record', {'value': 1}, dedup_key='k')
+    job = jobs.claim('w1')
+    assert job['id'] == first
+
+    follow_up = jobs.enqueue('record', {'value': 2}, dedup_key='k')
+    assert follow_up != first
+    # The follow-up must not run next to the job it follows
+    assert jobs.claim('w2') is None
+
+    jobs.execute(job)
+    assert jobs.claim('w2')['id'] == follow_up
+
+
+def test_failed_retry_is_superseded_by_queued_follow_up(jobs):
+    first = jobs.enqueue('explode', dedup_key='k')
+    job = jobs.claim('w1')
+    follow_up = jobs.enqueue('explode', dedup_key='k')
+
+    assert jobs.execute(job) is False
+    assert _status(jobs, first) == 'superseded'
+    assert _status(jobs, follow_up) == 'queued'
+
+
+def test_stale_running_job_is_requeued_or_superseded(jobs):
+    lone = jobs.enqueue('record', dedup_key='a')
+    jobs.claim('w1')
+    covered = jobs.enqueue('record', dedup_key='b')
+    jobs.claim('w1')
+    follow_up = jobs.enqueue('record', dedup_key='b')
+
+    jobs.app.config['JOBS_LOCK_TIMEOUT'] = -1
+    jobs.requeue_stale()
+
+    assert _status(jobs, lone) == 'queued'
+    assert _status(jobs, covered) == 'superseded'
+    assert _status(jobs, follow_up) == 'queued'
+
+
+def test_worker_survives_database_errors(jobs, monkeypatch):
+    jobs.app.config['JOBS_POLL_INTERVAL'] = 0.01
+    jobs.enqueue('record', {'value': 1})
+    claim, failures = jobs.claim, []
+
+    def flaky_claim(worker_id):
+        if not failures:
+            failures.append(True)
+            raise OperationalError('claim', {}, Exception('database is locked'))
+        return claim(worker_id)
+
+    monkeypatch.setattr(jobs, 'claim', flaky_claim)
+    jobs.work(burst=True)
+
+    assert failures and jobs.calls == [1]
+
+
+def test_enqueue_joins_the_callers_transaction(jobs):
+    engine = jobs.engine
+    with engine.connect() as conn:
+        with conn.begin() as transaction:
+            first = jobs.enqueue('record', {'value': 1}, dedup_key='k', conn=conn)
+            # A duplicate must not break the caller's transaction
+            assert jobs.enqueue('record', {'value': 2}, dedup_key='k', conn=conn) == first
+            jobs.enqueue('record', {'value': 3}, conn=conn)
+            transaction.rollback()
+
+    with engine.connect() as conn:
+        assert conn.execute(select(jobs_table.c.id)).all() == []
+
+    with engine.connect() as conn:
+        with conn.begin():
+            job_id = jobs.enqueue('record', {'value': 4}, conn=conn)
+    assert _status(jobs, job_id) == 'queued'
@@ -0,0 +1,133 @@
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+from sqlalchemy import Column, Float, Integer, create_engine, event, insert
+from sqlalchemy.orm import declarative_base
+
+from pricing import PricingEngine
+
+Base = declarative_base()
+
+
+class Place(Base):
+    __tablename__ = 'places'
+    id = Column(Integer, primary_key=True)
+    price = Column(Float)
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'pricing.db'}")
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(Place.__table__), [{'id': 1, 'price': 50}, {'id': 2, 'price': 80}, {'id': 7, 'price': 10}])
+    return engine
+
+
+def expected_total(price, start, end, guests, seasons=(), weekend=1.0, tier=1.0):
+    total = 0.0
+    day = start
+    while day < end:
+        rate = price
+        for season_start, season_end, multiplier in seasons:
+            mmdd = day.strftime('%m-%d')
+            inside = season_start <= mmdd <= season_end if season_start <= season_end \
+                else mmdd >= season_start or mmdd <= season_end
+            if inside:
+                rate *= multiplier
+        if day.weekday() in (4, 5):
+            rate *= weekend
+        total += rate
+        day += timedelta(days=1)
+    return round(total * guests * tier, 2)
+
+
+def test_default_totals_are_price_times_guests_times_nights(engine):
+    pricing = PricingEngine(Place)
+    pricing.ensure_loaded(engine)
+    start = date.today() + timedelta(days=3)
+
+    assert pricing.quote(1, start, start + timedelta(days=2), 3) == 50 * 3 * 2
+    assert pricing.quote(7, start, start + timedelta(days=5), 1) == 10 * 5
+
+
+def test_seasons_weekends_and_guest_tiers(engine):
+    pricing = PricingEngine(Place)
+    pricing.seasons = [('12-20', '01-10', 1.5), ('06-01', '08-31', 1.3)]
+    pricing.weekend_multiplier = 1.2
+    pricing.guest_tiers = [(1, 1.0), (4, 0.9)]
+    pricing.ensure_loaded(engine)
+
+    today = date.today()
+    starts = [today + timedelta(days=d) for d in (0, 30, 150, 300)]
+    ends = [start + timedelta(days=9) for start in starts]
+    totals = pricing.quote_many([2, 1, 2, 7], starts, ends, [2, 4, 5, 1])
+
+    expected = [
+        expected_total(80, starts[0], ends[0], 2, pricing.seasons, 1.2),
+        expected_total(50, starts[1], ends[1], 4, pricing.seasons, 1.2, 0.9),
+        expected_total(80, starts[2], ends[2], 5, pricing.seasons, 1.2, 0.9),
+        expected_total(10, starts[3], ends[3], 1, pricing.seasons, 1.2),
+    ]
+    assert totals.tolist() == pytest.approx(expected)
+
+
+def test_invalid_quotes_are_nan(engine):
+    pricing = PricingEngine(Place)
+    pricing.ensure_loaded(engine)
+    today = date.today()
+
+    totals = pricing.quote_many(
+        [3, 1, 1, 1, 1],
+        [today, today - timedelta(days=1), today + timedelta(days=2), today, today],
+        [today + timedelta(days=1), today + timedelta(days=1), today + timedelta(days=1),
+         today + timedelta(days=400), today + timedelta(days=1)],
+        [1, 1, 1, 1, 0],
+    )
+    assert np.isnan(totals).all()
+
+
+def test_committed_changes_are_applied(engine):
+    pricing = PricingEngine(Place)
+    pricing.ensure_loaded(engine)
+    start = date.today() + timedelta(days=1)
+    end = start + timedelta(days=1)
+
+    pricing.update_place(1, 60)
+    pricing.update_place(5, 30)
+    pricing.remove_place(7)
+
+    assert pricing.quote(1, start, end, 1) == 60
+    assert pricing.quote(5, start, end, 1) == 30
+    assert pricing.quote(7, start, end, 1) is None
+
+
+def test_changes_committed_during_rebuild_survive(engine):
+    pricing = PricingEngine(Place)
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def commit_meanwhile(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith('SELECT places.id'):
+            pricing.update_place(2, 99)
+
+    pricing.rebuild(engine)
+    start = date.today() + timedelta(days=1)
+
+    assert pricing.quote(2, start, start + timedelta(days=1), 1) == 99
+
+
+def test_explicit_base_price_overrides_the_cache(engine):
+    pricing = PricingEngine(Place)
+    pricing.ensure_loaded(engine)
+    start = date.today() + timedelta(days=3)
+    end = start + timedelta(days=2)
+    # Changed (or inserted) by another process: not in this engine's cache yet
+    with engine.begin() as conn:
+        conn.execute(Place.__table__.update().where(Place.id == 1).values(price=500))
+        conn.execute(insert(Place.__table__), [{'id': 9, 'price': 20}])
+
+    assert pricing.quote(1, start, end, 1) == 100
+    assert pricing.quote(1, start, end, 1, base_price=500) == 1000
+    assert pricing.quote(9, start, end, 1) is None
+    assert pricing.quote(9, start, end, 1, base_price=20) == 40
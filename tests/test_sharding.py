@@ -0,0 +1,148 @@
+from collections import Counter
+
+import pytest
+from flask import Flask
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import Column, Integer, String, create_engine, func, insert, select
+from sqlalchemy.orm import declarative_base
+
+from sharding import HashRing, ShardRouter
+from write_queue import WriteQueue
+
+Base = declarative_base()
+
+
+class Booking(Base):
+    __tablename__ = 'bookings'
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, nullable=False)
+    place_id = Column(Integer, nullable=False)
+    status = Column(String(20), default='pending')
+
+
+TABLES = {'bookings': (Booking, 'place_id')}
+
+
+@pytest.fixture
+def make_router(tmp_path):
+    def make(shards, **config):
+        app = Flask(__name__)
+        app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'primary.db'}"
+        app.config['SHARD_URIS'] = [f"{name}=sqlite:///{tmp_path / name}.db" for name in shards]
+        app.config.update(config)
+        db = SQLAlchemy(app)
+        router = ShardRouter(app, db, TABLES, primary_queue=WriteQueue(app, db))
+        router.create_tables()
+        return router
+    return make
+
+
+def rows_on(router, shard_name):
+    with router.shards[shard_name].engine.connect() as conn:
+        return conn.execute(select(Booking.__table__).order_by(Booking.id)).mappings().all()
+
+
+def test_ring_moves_about_one_nth_of_the_keys():
+    before = HashRing(['a', 'b', 'c'])
+    after = HashRing(['a', 'b', 'c', 'd'])
+    keys = range(20000)
+
+    owners = Counter(after.node_for(key) for key in keys)
+    moved = [key for key in keys if before.node_for(key) != after.node_for(key)]
+
+    assert all(0.2 < count / len(keys) < 0.3 for count in owners.values())
+    assert 0.2 < len(moved) / len(keys) < 0.3
+    assert all(after.node_for(key) == 'd' for key in moved)
+
+
+def test_ids_are_unique_across_processes(make_router):
+    first = make_router(['s0', 's1'], SHARD_ID_BLOCK=10)
+    second = make_router(['s0', 's1'], SHARD_ID_BLOCK=10)
+
+    ids = [router.new_id() for _ in range(25) for router in (first, second)]
+
+    assert len(set(ids)) == len(ids)
+
+
+def test_ids_start_above_existing_rows(make_router, tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 's0'}.db")
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(Booking.__table__).values(id=500, user_id=1, place_id=1))
+
+    assert make_router(['s0', 's1']).new_id() > 500
+
+
+def test_writes_go_to_the_owner_and_scatter_reads_all(make_router):
+    router = make_router(['s0', 's1', 's2'])
+
+    for place_id in range(1, 31):
+        router.run_write(router.shard_for('bookings', place_id), lambda session, place_id=place_id: session.add(
+            Booking(id=router.new_id(), user_id=place_id % 2, place_id=place_id)))
+
+    for name in router.shards:
+        assert all(router.shard_for('bookings', row['place_id']).name == name for row in rows_on(router, name))
+    user_bookings = router.scatter(lambda session: session.query(Booking).filter_by(user_id=1).all())
+    assert sorted(booking.place_id for booking in user_bookings) == list(range(1, 31, 2))
+
+
+def test_rebalance_moves_rows_to_new_owners(make_router):
+    old = make_router(['s0', 's1'])
+    for place_id in range(1, 201):
+        old.run_write(old.shard_for('bookings', place_id), lambda session, place_id=place_id: session.add(
+            Booking(id=old.new_id(), user_id=1, place_id=place_id)))
+
+    new = make_router(['s0', 's1', 's2'], SHARD_REBALANCING=True)
+    result = new.rebalance(batch_size=37)
+
+    assert 0 < result['bookings']['moved'] < 200 and result['bookings']['conflicts'] == 0
+    placed = {name: rows_on(new, name) for name in new.shards}
+    assert sum(len(rows) for rows in placed.values()) == 200
+    for name, rows in placed.items():
+        assert all(new.shard_for('bookings', row['place_id']).name == name for row in rows)
+
+
+def test_rebalance_keeps_rows_whose_id_is_taken_by_another_row(make_router):
+    router = make_router(['s0', 's1'])
+    place_id, other_place_id = [key for key in range(1, 100) if router.shard_for('bookings', key).name == 's1'][:2]
+
+    with router.shards['s0'].engine.begin() as conn:
+        conn.execute(insert(Booking.__table__).values(id=7, user_id=1, place_id=place_id))
+    with router.shards['s1'].engine.begin() as conn:
+        conn.execute(insert(Booking.__table__).values(id=7, user_id=2, place_id=other_place_id))
+
+    assert router.rebalance()['bookings'] == {'moved': 0, 'conflicts': 1}
+    assert [row['user_id'] for row in rows_on(router, 's0')] == [1]
+    assert [row['user_id'] for row in rows_on(router, 's1')] == [2]
+
+
+def _legacy_rows(tmp_path, rows):
+    engine = create_engine(f"sqlite:///{tmp_path / 'primary.db'}")
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(Booking.__table__), rows)
+    return engine
+
+
+def test_rows_from_before_sharding_are_visible_while_rebalancing(make_router, tmp_path):
+    _legacy_rows(tmp_path, [{'id': i, 'user_id': 1, 'place_id': i} for i in range(1, 11)])
+    router = make_router(['s0', 's1'], SHARD_REBALANCING=True)
+
+    with router.app.app_context():
+        keyed = router.query_keyed('bookings', 3,
+                                   lambda session: session.query(Booking).filter_by(place_id=3).all())
+        scattered = router.scatter(lambda session: session.query(Booking).filter_by(user_id=1).all())
+
+        assert [booking.id for booking in keyed] == [3]
+        assert len(scattered) == 10
+
+
+def test_rebalance_imports_rows_from_the_primary(make_router, tmp_path):
+    primary = _legacy_rows(tmp_path, [{'id': i, 'user_id': 1, 'place_id': i} for i in range(1, 51)])
+    router = make_router(['s0', 's1'])
+
+    assert router.rebalance()['bookings'] == {'moved': 50, 'conflicts': 0}
+    with primary.connect() as conn:
+        assert conn.execute(select(func.count()).select_from(Booking.__table__)).scalar() == 0
+    assert sorted(row['id'] for name in router.shards for row in rows_on(router, name)) == list(range(1, 51))
+    assert router.new_id() > 50
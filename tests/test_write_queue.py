@@ -0,0 +1,129 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+from flask import Flask
+from flask_sqlalchemy import SQLAlchemy
+
+from write_queue import WriteQueue
+
+
+@pytest.fixture
+def env(tmp_path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'wq.db'}"
+    app.config['WRITE_QUEUE_MAX_DELAY_MS'] = 200
+    db = SQLAlchemy(app)
+
+    class Item(db.Model):
+        id = db.Column(db.Integer, primary_key=True)
+        name = db.Column(db.String(20), nullable=False)
+
+    with app.app_context():
+        db.create_all()
+    queue = WriteQueue(app, db)
+    return app, db, Item, queue
+
+
+def _add(db, Item, name):
+    def job():
+        item = Item(name=name)
+        db.session.add(item)
+        db.session.flush()
+        return item.id
+    return job
+
+
+def test_batch_is_committed_in_one_transaction(env, tmp_path):
+    app, db, Item, queue = env
+    seen_from_outside = []
+
+    def peek():
+        # Another connection must not see earlier jobs before the batch commits
+        conn = sqlite3.connect(tmp_path / 'wq.db')
+        try:
+            seen_from_outside.append(conn.execute('SELECT COUNT(*) FROM item').fetchone()[0])
+        finally:
+            conn.close()
+
+    futures = [queue.submit(_add(db, Item, f'item{i}')) for i in range(3)] + [queue.submit(peek)]
+    ids = [future.result(timeout=5) for future in futures[:3]]
+    futures[3].result(timeout=5)
+
+    assert len(set(ids)) == 3
+    assert seen_from_outside == [0]
+    assert queue.stats['batches'] == 1
+    with app.app_context():
+        assert Item.query.count() == 3
+
+
+def test_failing_job_only_rolls_back_itself(env):
+    app, db, Item, queue = env
+
+    def broken():
+        db.session.add(Item(name='broken'))
+        db.session.flush()
+        raise ValueError('boom')
+
+    futures = [queue.submit(_add(db, Item, 'a')), queue.submit(broken), queue.submit(_add(db, Item, 'b'))]
+
+    assert futures[0].result(timeout=5)
+    with pytest.raises(ValueError):
+        futures[1].result(timeout=5)
+    assert futures[2].result(timeout=5)
+    assert queue.stats['failed'] == 1
+    with app.app_context():
+        assert sorted(item.name for item in Item.query.all()) == ['a', 'b']
+
+
+def test_inline_mode_commits_each_job(env):
+    app, db, Item, queue = env
+    queue.enabled = False
+
+    with app.app_context():
+        assert queue.run(_add(db, Item, 'inline'))
+        with pytest.raises(ValueError):
+            queue.run(lambda: (_ for _ in ()).throw(ValueError('boom')))
+        assert [item.name for item in Item.query.all()] == ['inline']
+
+
+def _blocking(release):
+    def job():
+        release.wait(5)
+    return job
+
+
+def test_timed_out_job_that_has_not_started_never_runs(env):
+    app, db, Item, queue = env
+    app.config.update(WRITE_QUEUE_MAX_BATCH=1, WRITE_QUEUE_TIMEOUT=0.2)
+    release = threading.Event()
+    blocker = queue.submit(_blocking(release))
+
+    with app.app_context():
+        with pytest.raises(TimeoutError):
+            queue.run(_add(db, Item, 'late'))
+    release.set()
+    blocker.result(timeout=5)
+    queue.submit(_add(db, Item, 'after')).result(timeout=5)
+
+    with app.app_context():
+        assert [item.name for item in Item.query.all()] == ['after']
+
+
+def test_timed_out_job_already_running_returns_its_result(env):
+    app, db, Item, queue = env
+    app.config.update(WRITE_QUEUE_MAX_DELAY_MS=1, WRITE_QUEUE_TIMEOUT=0.1)
+    add = _add(db, Item, 'slow')
+
+    def slow_add():
+        item_id = add()
+        time.sleep(0.3)
+        return item_id
+
+    # Outlives its own timeout but is committed: the caller must get its result
+    with app.app_context():
+        item_id = queue.run(slow_add)
+
+    with app.app_context():
+        assert db.session.get(Item, item_id).name == 'slow'
@@ -0,0 +1,208 @@
+"""
+Group-commit write queue.
+
+Write endpoints hand a small function to ``WriteQueue.run()``.  A single
+writer thread collects everything submitted within ``WRITE_QUEUE_MAX_DELAY_MS``
+(up to ``WRITE_QUEUE_MAX_BATCH`` jobs), runs each job inside its own SAVEPOINT
+and commits the whole batch in one transaction, i.e. one fsync for the batch
+instead of one per request.  A failing job only rolls back its own savepoint;
+its caller gets the exception and the rest of the batch still commits.
+
+A caller that times out cancels its job if the writer has not started it yet
+(it then never runs); a job already in a batch is waited for, so a caller never
+gets an error for a write that was committed.
+
+Jobs run in the writer thread: they must use the queue's session (``db.session``
+unless another scoped session was given) and plain values captured from the
+request, never ``flask.session`` or ``request``.
+
+Config keys:
+    WRITE_QUEUE_ENABLED          False runs every job inline with its own commit
+    WRITE_QUEUE_MAX_BATCH        maximum jobs per transaction
+    WRITE_QUEUE_MAX_DELAY_MS     how long the writer waits to fill a batch
+    WRITE_QUEUE_TIMEOUT          seconds a caller waits for its result
+    WRITE_QUEUE_SYNCHRONOUS      SQLite PRAGMA synchronous (FULL, NORMAL, OFF)
+    WRITE_QUEUE_JOURNAL_MODE     SQLite PRAGMA journal_mode (e.g. WAL), None keeps the default
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError
+
+from sqlalchemy import event
+
+
+class WriteQueue:
+    """Yazmaları bir transaksiyada birləşdirən tək yazıcı axın"""
+
+    def __init__(self, app=None, db=None, session=None, engine=None):
+        self.app = app
+        self.db = db
+        self.session = session
+        self.enabled = False
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.stats = {'batches': 0, 'jobs': 0, 'failed': 0}
+        if app is not None:
+            self.init_app(app, db, session, engine)
+
+    def init_app(self, app, db=None, session=None, engine=None):
+        """session/engine default to db.session/db.engine (the app-wide queue)"""
+        self.app = app
+        if db is not None:
+            self.db = db
+        if session is not None:
+            self.session = session
+
+        app.config.setdefault('WRITE_QUEUE_ENABLED', True)
+        app.config.setdefault('WRITE_QUEUE_MAX_BATCH', 64)
+        app.config.setdefault('WRITE_QUEUE_MAX_DELAY_MS', 2)
+        app.config.setdefault('WRITE_QUEUE_TIMEOUT', 10)
+        app.config.setdefault('WRITE_QUEUE_SYNCHRONOUS', 'FULL')
+        app.config.setdefault('WRITE_QUEUE_JOURNAL_MODE', None)
+
+        self.enabled = app.config['WRITE_QUEUE_ENABLED']
+        self._explicit_begin = False
+        if self.session is None:
+            self.session = self.db.session
+            app.extensions['write_queue'] = self
+
+        if engine is None:
+            with app.app_context():
+                engine = self.db.engine
+        if engine.dialect.name == 'sqlite':
+            self._explicit_begin = True
+            synchronous = app.config['WRITE_QUEUE_SYNCHRONOUS']
+            journal_mode = app.config['WRITE_QUEUE_JOURNAL_MODE']
+
+            @event.listens_for(engine, 'connect')
+            def set_durability(dbapi_connection, connection_record):
+                cursor = dbapi_connection.cursor()
+                if journal_mode:
+                    cursor.execute(f'PRAGMA journal_mode={journal_mode}')
+                cursor.execute(f'PRAGMA synchronous={synchronous}')
+                cursor.close()
+
+    # ----------------------------------------
+    # Callers
+    # ----------------------------------------
+
+    def submit(self, job):
+        """İşi növbəyə əlavə et; nəticəni Future kimi qaytar"""
+        future = Future()
+        if not self.enabled:
+            self._run_inline(job, future)
+            return future
+
+        self._ensure_thread()
+        self._queue.put((job, future))
+        return future
+
+    def run(self, job):
+        """İşi icra et və nəticəsini gözlə (xəta olarsa yenidən qaldırılır)"""
+        if self.enabled:
+            # Give the caller's pooled connection back while it waits, otherwise
+            # enough waiting requests starve the writer of connections
+            self.session.close()
+        future = self.submit(job)
+        try:
+            return future.result(timeout=self.app.config['WRITE_QUEUE_TIMEOUT'])
+        except TimeoutError:
+            if future.cancel():
+                raise
+            # Already part of a batch: its outcome is decided by that commit
+            return future.result()
+
+    def _run_inline(self, job, future):
+        try:
+            result = job()
+            self.session.commit()
+        except Exception as e:
+            self.session.rollback()
+            future.set_exception(e)
+        else:
+            future.set_result(result)
+
+    # ----------------------------------------
+    # Writer thread
+    # ----------------------------------------
+
+    def _ensure_thread(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._writer, name='write-queue', daemon=True)
+                self._thread.start()
+
+    def _collect(self):
+        """Birinci işi gözlə, sonra limitlər daxilində batch-i doldur"""
+        batch = [self._queue.get()]
+        max_batch = self.app.config['WRITE_QUEUE_MAX_BATCH']
+        deadline = time.monotonic() + self.app.config['WRITE_QUEUE_MAX_DELAY_MS'] / 1000
+
+        while len(batch) < max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _writer(self):
+        while True:
+            batch = self._collect()
+            with self.app.app_context():
+                try:
+                    self._commit_batch(batch)
+                except Exception as e:
+                    print(f"Write queue error: {str(e)}")
+                    for _, future in batch:
+                        if not future.done():
+                            future.set_exception(e)
+                finally:
+                    self.session.remove()
+
+    def _commit_batch(self, batch):
+        # Skip jobs whose caller timed out and cancelled them
+        batch = [(job, future) for job, future in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        results = []
+
+        if self._explicit_begin:
+            # pysqlite emits BEGIN only before DML, so without it every SAVEPOINT
+            # would open (and its RELEASE commit) a transaction of its own.
+            # IMMEDIATE takes the write lock up front: no upgrade deadlock with readers.
+            self.session.connection().exec_driver_sql('BEGIN IMMEDIATE')
+
+        for job, future in batch:
+            try:
+                with self.session.begin_nested():
+                    results.append((future, job(), None))
+            except Exception as e:
+                results.append((future, None, e))
+
+        try:
+            self.session.commit()
+        except Exception as e:
+            # The batch could not be committed as a whole: retry jobs one by one
+            print(f"Batch commit error, retrying individually: {str(e)}")
+            self.session.rollback()
+            for job, future in batch:
+                self._run_inline(job, future)
+            self.stats['batches'] += len(batch)
+            self.stats['jobs'] += len(batch)
+            return
+
+        self.stats['batches'] += 1
+        self.stats['jobs'] += len(batch)
+        for future, result, error in results:
+            if error is not None:
+                self.stats['failed'] += 1
+                future.set_exception(error)
+            else:
+                future.set_result(result)